@@ -0,0 +1,324 @@
+"""
+Real-time admin feed: new orders, order status / confirmation changes and
+low-stock products, streamed to the dashboard over Server-Sent Events
+
+One MongoDB change stream per process (on orders and products) feeds every
+connected admin. Where change streams are unavailable (a standalone server,
+mongomock) the feed falls back to in-process events published by the routes
+and background jobs that make those changes.
+
+Event ids are change stream resume tokens (or a per-process sequence in the
+fallback). The last events are kept in a replay buffer so a reconnecting
+EventSource resumes from Last-Event-ID; the watcher itself resumes its change
+stream from the last token after a transient error. Each connection has a
+bounded queue: a consumer that falls too far behind gets a "reset" event and
+is disconnected instead of slowing down the others.
+
+Streams end after ADMIN_FEED_MAX_STREAM_SECONDS, and all at once when the
+process starts draining (the server waits for open connections before the
+lifespan shutdown runs), so clients reconnect, to another instance if need be.
+
+EventSource can't send an Authorization header, so a stream is opened with a
+ticket: a random, single-use value valid for STREAM_TICKET_TTL_SECONDS,
+issued to an authenticated admin. Only its hash is stored, and what ends up
+in access logs is useless once redeemed.
+"""
+import asyncio
+import hashlib
+import itertools
+import logging
+import os
+import secrets
+import time
+from collections import deque
+from datetime import datetime, timedelta
+from typing import AsyncIterator, Deque, Iterable, List, Optional, Set, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import OperationFailure, PyMongoError
+
+from serialization import dumps
+
+logger = logging.getLogger(__name__)
+
+LOW_STOCK_THRESHOLD = int(os.environ.get("LOW_STOCK_THRESHOLD", "5"))
+# Events buffered per connection before it is considered too slow
+ADMIN_FEED_QUEUE_SIZE = int(os.environ.get("ADMIN_FEED_QUEUE_SIZE", "256"))
+# Recent events kept for Last-Event-ID resume
+ADMIN_FEED_REPLAY_SIZE = int(os.environ.get("ADMIN_FEED_REPLAY_SIZE", "500"))
+# A stream is ended after this long; the client reconnects and resumes
+ADMIN_FEED_MAX_STREAM_SECONDS = float(os.environ.get("ADMIN_FEED_MAX_STREAM_SECONDS", "300"))
+STREAM_TICKET_TTL_SECONDS = 30
+HEARTBEAT_SECONDS = 15
+WATCH_RETRY_SECONDS = 5
+
+# Server errors meaning change streams can't be used here (standalone server / unsupported)
+_CHANGE_STREAMS_UNSUPPORTED = {40573, 40324, 115}
+# The resume token fell off the oplog
+_CHANGE_STREAM_HISTORY_LOST = 286
+
+_ORDER_FIELDS = ("id", "public_order_id", "customer_name", "phone", "city", "total", "status", "confirmation_status", "created_at")
+
+WATCH_PIPELINE = [
+    {"$match": {"$or": [
+        {"ns.coll": "orders", "operationType": "insert"},
+        {"ns.coll": "orders", "operationType": "update", "$or": [
+            {"updateDescription.updatedFields.status": {"$exists": True}},
+            {"updateDescription.updatedFields.confirmation_status": {"$exists": True}},
+        ]},
+        {"ns.coll": "products", "operationType": "update",
+         "updateDescription.updatedFields.quantity": {"$lte": LOW_STOCK_THRESHOLD}},
+    ]}}
+]
+
+_CLOSE = object()
+
+
+def order_created_event(order: dict) -> dict:
+    return {"type": "order_created", "order": {field: order.get(field) for field in _ORDER_FIELDS}}
+
+
+def order_updated_event(order_id: str, changes: dict, public_order_id: Optional[str] = None) -> dict:
+    return {"type": "order_updated", "order_id": order_id, "public_order_id": public_order_id, "changes": changes}
+
+
+def low_stock_event(product: dict) -> dict:
+    return {
+        "type": "low_stock",
+        "product_id": product.get("id"),
+        "name_en": product.get("name_en"),
+        "name_ar": product.get("name_ar"),
+        "quantity": product.get("quantity"),
+    }
+
+
+def event_from_change(change: dict) -> Optional[dict]:
+    collection = change["ns"]["coll"]
+    document = change.get("fullDocument") or {}
+    if collection == "orders" and change["operationType"] == "insert":
+        return order_created_event(document)
+    if collection == "orders":
+        updated = change.get("updateDescription", {}).get("updatedFields", {})
+        changes = {field: updated[field] for field in ("status", "confirmation_status") if field in updated}
+        return order_updated_event(document.get("id"), changes, document.get("public_order_id"))
+    if collection == "products" and document:
+        return low_stock_event({**document, "quantity": change["updateDescription"]["updatedFields"]["quantity"]})
+    return None
+
+
+class Subscription:
+    def __init__(self):
+        self.queue: asyncio.Queue = asyncio.Queue(maxsize=ADMIN_FEED_QUEUE_SIZE)
+        self.overflowed = False
+
+    def offer(self, item) -> None:
+        if self.overflowed:
+            return
+        try:
+            self.queue.put_nowait(item)
+        except asyncio.QueueFull:
+            # Too slow: stop queueing and let the stream tell the client to resume or refetch
+            self.overflowed = True
+
+
+class AdminEventBroker:
+    def __init__(self):
+        self.mode = "local"
+        self._subscriptions: Set[Subscription] = set()
+        self._recent: Deque[Tuple[str, dict]] = deque(maxlen=ADMIN_FEED_REPLAY_SIZE)
+        self._sequence = itertools.count(1)
+        self._watch_task: Optional[asyncio.Task] = None
+        self._closing = False
+
+    @property
+    def has_subscribers(self) -> bool:
+        return bool(self._subscriptions)
+
+    # ---- publishing ----
+
+    def _publish(self, event_id: str, event: dict) -> None:
+        self._recent.append((event_id, event))
+        for subscription in list(self._subscriptions):
+            subscription.offer((event_id, event))
+
+    def publish_local(self, events: Iterable[dict]) -> None:
+        """Events from this process; ignored while the change stream reports them"""
+        if self.mode != "local":
+            return
+        for event in events:
+            self._publish(f"local-{next(self._sequence)}", event)
+
+    # ---- change stream ----
+
+    def start(self, db: AsyncIOMotorDatabase) -> None:
+        self._closing = False
+        if self._watch_task is None or self._watch_task.done():
+            self._watch_task = asyncio.create_task(self._watch(db))
+
+    def close_streams(self) -> None:
+        """End every open stream and every new one right away (called when draining starts)"""
+        self._closing = True
+        for subscription in list(self._subscriptions):
+            # A full queue is marked overflowed, which ends its stream as well
+            subscription.offer(_CLOSE)
+
+    async def stop(self) -> None:
+        """Stop watching and end any stream still open"""
+        self.close_streams()
+        if self._watch_task is not None:
+            self._watch_task.cancel()
+            try:
+                await self._watch_task
+            except asyncio.CancelledError:
+                pass
+            self._watch_task = None
+
+    async def _watch(self, db: AsyncIOMotorDatabase) -> None:
+        resume_token = None
+        while True:
+            try:
+                # Opening a change stream does no I/O; a client without them fails right here
+                change_stream = db.watch(WATCH_PIPELINE, full_document="updateLookup", resume_after=resume_token)
+            except (NotImplementedError, AttributeError, TypeError) as e:
+                logger.info("Change streams unavailable (%s); admin feed uses in-process events", e)
+                self.mode = "local"
+                return
+            try:
+                async with change_stream as stream:
+                    if self.mode != "change_stream":
+                        logger.info("Admin feed following the change stream")
+                    self.mode = "change_stream"
+                    async for change in stream:
+                        resume_token = stream.resume_token
+                        event = event_from_change(change)
+                        if event is not None:
+                            self._publish(change["_id"]["_data"], event)
+            except asyncio.CancelledError:
+                raise
+            except OperationFailure as e:
+                if e.code in _CHANGE_STREAMS_UNSUPPORTED:
+                    logger.info("Change streams unavailable (%s); admin feed uses in-process events", e.code)
+                    self.mode = "local"
+                    return
+                if e.code == _CHANGE_STREAM_HISTORY_LOST:
+                    logger.warning("Admin feed resume token expired; some events were missed")
+                    resume_token = None
+                else:
+                    logger.warning("Admin feed change stream failed, retrying: %s", e)
+            except PyMongoError as e:
+                logger.warning("Admin feed change stream interrupted, resuming: %s", e)
+            except Exception:
+                logger.exception("Admin feed watcher error, resuming")
+            await asyncio.sleep(WATCH_RETRY_SECONDS)
+
+    # ---- subscribing ----
+
+    def subscribe(self, last_event_id: Optional[str] = None) -> Tuple[Subscription, bool]:
+        """
+        Register a connection, replaying events after last_event_id
+        Returns the subscription and whether the resume point was found
+        """
+        subscription = Subscription()
+        resumed = last_event_id is None
+        if last_event_id is not None:
+            ids = [event_id for event_id, _ in self._recent]
+            if last_event_id in ids:
+                resumed = True
+                for item in list(self._recent)[ids.index(last_event_id) + 1:]:
+                    subscription.offer(item)
+        self._subscriptions.add(subscription)
+        return subscription, resumed
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        self._subscriptions.discard(subscription)
+
+    async def stream(self, last_event_id: Optional[str] = None) -> AsyncIterator[str]:
+        """SSE frames for one connection, for at most ADMIN_FEED_MAX_STREAM_SECONDS"""
+        retry = f"retry: {WATCH_RETRY_SECONDS * 1000}\n\n"
+        if self._closing:
+            yield retry
+            return
+        subscription, resumed = self.subscribe(last_event_id)
+        deadline = time.monotonic() + ADMIN_FEED_MAX_STREAM_SECONDS
+        try:
+            yield retry
+            if not resumed:
+                yield _frame("reset", {"reason": "resume_point_unavailable"})
+            while True:
+                if subscription.overflowed:
+                    yield _frame("reset", {"reason": "slow_consumer"})
+                    return
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    return
+                try:
+                    item = await asyncio.wait_for(subscription.queue.get(), min(HEARTBEAT_SECONDS, remaining))
+                except asyncio.TimeoutError:
+                    yield ": keep-alive\n\n"
+                    continue
+                if item is _CLOSE:
+                    return
+                event_id, event = item
+                yield _frame(event["type"], event, event_id)
+        finally:
+            self.unsubscribe(subscription)
+
+
+def _frame(event_type: str, data: dict, event_id: Optional[str] = None) -> str:
+    lines = []
+    if event_id is not None:
+        lines.append(f"id: {event_id}")
+    lines.append(f"event: {event_type}")
+    lines.append(f"data: {dumps(data).decode('utf-8')}")
+    return "\n".join(lines) + "\n\n"
+
+
+admin_events = AdminEventBroker()
+
+
+# ---- stream tickets ----
+
+def _ticket_hash(ticket: str) -> str:
+    return hashlib.sha256(ticket.encode("utf-8")).hexdigest()
+
+
+async def issue_stream_ticket(db: AsyncIOMotorDatabase, username: Optional[str]) -> dict:
+    """A single-use ticket for opening one event stream"""
+    ticket = secrets.token_urlsafe(32)
+    now = datetime.utcnow()
+    await db.event_stream_tickets.insert_one({
+        "_id": _ticket_hash(ticket),
+        "username": username,
+        "created_at": now,
+        "expires_at": now + timedelta(seconds=STREAM_TICKET_TTL_SECONDS),
+    })
+    return {"ticket": ticket, "expires_in": STREAM_TICKET_TTL_SECONDS}
+
+
+async def redeem_stream_ticket(db: AsyncIOMotorDatabase, ticket: str) -> bool:
+    """Consume a ticket; False if it is unknown, used or expired (the TTL monitor lags)"""
+    redeemed = await db.event_stream_tickets.find_one_and_delete(
+        {"_id": _ticket_hash(ticket), "expires_at": {"$gt": datetime.utcnow()}}
+    )
+    return redeemed is not None
+
+
+# ---- in-process publishing helpers (no-ops while the change stream is in use) ----
+
+def publish_order_created(order: dict) -> None:
+    admin_events.publish_local([order_created_event(order)])
+
+
+def publish_orders_updated(order_ids: Iterable[str], changes: dict, public_order_id: Optional[str] = None) -> None:
+    admin_events.publish_local(order_updated_event(order_id, changes, public_order_id) for order_id in order_ids)
+
+
+async def publish_low_stock(db: AsyncIOMotorDatabase, product_ids: List[str]) -> None:
+    """Announce products among product_ids that are at or below the low-stock threshold"""
+    if admin_events.mode != "local" or not admin_events.has_subscribers or not product_ids:
+        return
+    products = await db.products.find(
+        {"id": {"$in": product_ids}, "quantity": {"$lte": LOW_STOCK_THRESHOLD}},
+        {"_id": 0, "id": 1, "name_en": 1, "name_ar": 1, "quantity": 1}
+    ).to_list(None)
+    admin_events.publish_local(low_stock_event(product) for product in products)
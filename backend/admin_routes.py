@@ -1,7 +1,10 @@
-from fastapi import APIRouter, HTTPException, Header, Depends, UploadFile, File
+from fastapi import APIRouter, HTTPException, Header, Depends, UploadFile, File, Query
+from fastapi.responses import StreamingResponse
 from typing import List, Optional
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+import asyncio
 import os
 import uuid
 import shutil
@@ -10,17 +13,28 @@ from models import (
     Admin, AdminLogin, AdminResponse,
     Product, ProductCreate, ProductUpdate,
     NotifyRequest, NotifyRequestCreate,
-    Order, OrderCreate, OrderStatusUpdate,
-    Customer, Coupon, CouponCreate, CouponValidate, CouponValidateResponse
+    Order, OrderCreate, OrderStatusUpdate, OrderBulkStatusUpdate, OrderBulkDelete,
+    Customer, Coupon, CouponCreate, CouponValidate, CouponValidateResponse,
+    write_timestamp
 )
 from auth import hash_password, verify_password, create_access_token, decode_access_token
+from restock_notifier import schedule_restock_notifications
+from inventory import ADMIN_ADJUSTMENT, ORDER_DELETED, PRODUCT_CREATED, movement, record_movements, restore_stock
+from admin_events import admin_events, issue_stream_ticket, publish_low_stock, publish_orders_updated, redeem_stream_ticket
+from inventory_reconciliation import REPAIR_MODES, reconcile_inventory
+from product_import import detect_format, import_products, read_csv_rows, read_ndjson_rows
+from catalog_cache import product_catalog, coupon_cache
+from phone_utils import normalize_saudi_phone, phone_variants
+from metrics import span
+from query_diagnostics import slow_query_listener
+from database import get_db, get_reporting_db
+from serialization import TrustedJSONResponse, model_projection, trusted_response
 
 admin_router = APIRouter(prefix="/admin", tags=["Admin"])
 
-# Dependency to get database
-def get_db():
-    from server import db
-    return db
+ORDER_STATUSES = ["Pending", "Confirmed", "Shipped", "Delivered", "Cancelled"]
+# Order ids accepted by one bulk request
+MAX_BULK_ORDERS = 1000
 
 # Dependency to verify admin token
 async def verify_admin_token(authorization: str = Header(None)):
@@ -136,26 +150,94 @@ async def create_product(
     """Create a new product"""
     product = Product(**product_data.model_dump())
     await db.products.insert_one(product.model_dump())
+    await record_movements(db, [movement(product.id, product.quantity, PRODUCT_CREATED)])
+    product_catalog.upsert(product.model_dump())
     return product
 
+@admin_router.post("/products/import")
+async def import_products_file(
+    file: UploadFile = File(...),
+    dry_run: bool = Query(False),
+    admin: dict = Depends(verify_admin_token),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Create or update products from a CSV or NDJSON file
+    Rows with the id of an existing product update it (missing fields are kept);
+    other rows create products. dry_run only validates.
+    Returns counts and the errors of rows that were not imported
+    """
+    file_format = detect_format(file.filename, file.content_type)
+    if file_format is None:
+        raise HTTPException(status_code=400, detail="Upload a .csv or .ndjson file")
+    
+    rows = read_csv_rows(file.file) if file_format == "csv" else read_ndjson_rows(file.file)
+    with span("import_products"):
+        return await import_products(db, rows, dry_run=dry_run)
+
+def _expected_updated_at(if_match: Optional[str]) -> Optional[datetime]:
+    """The updated_at the client last saw, sent as If-Match for optimistic concurrency"""
+    if not if_match:
+        return None
+    value = if_match.strip()
+    if value.startswith("W/"):
+        value = value[2:]
+    try:
+        return datetime.fromisoformat(value.strip('"'))
+    except ValueError:
+        raise HTTPException(status_code=400, detail="If-Match must be the updated_at value of the resource")
+
+async def _raise_update_failed(collection, resource_id: str, resource: str, expected_updated_at: Optional[datetime]):
+    """A conditional update matched nothing: tell a missing document from a concurrent change"""
+    if expected_updated_at is not None and await collection.find_one({"id": resource_id}, {"_id": 1}):
+        raise HTTPException(status_code=409, detail=f"{resource} was changed by someone else; reload and try again")
+    raise HTTPException(status_code=404, detail=f"{resource} not found")
+
 @admin_router.put("/products/{product_id}", response_model=Product)
 async def update_product(
     product_id: str,
     product_data: ProductUpdate,
+    if_match: Optional[str] = Header(None),
     admin: dict = Depends(verify_admin_token),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Update an existing product"""
-    existing_product = await db.products.find_one({"id": product_id}, {"_id": 0})
+    """
+    Update an existing product
+    Only fields present in the body change; null clears optional fields such as
+    original_price and is ignored for required ones (ProductUpdate.changes, which
+    product import applies the same way).
+    With If-Match set to the product's updated_at, a concurrent change returns 409.
+    """
+    update_data = product_data.changes()
+    update_data["updated_at"] = write_timestamp()
+    
+    query = {"id": product_id}
+    expected_updated_at = _expected_updated_at(if_match)
+    if expected_updated_at is not None:
+        query["updated_at"] = expected_updated_at
+    
+    # One round trip; the previous quantity is needed for the restock check and the
+    # updated document is exactly the previous one with update_data applied
+    existing_product = await db.products.find_one_and_update(
+        query,
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.BEFORE
+    )
     if not existing_product:
-        raise HTTPException(status_code=404, detail="Product not found")
+        await _raise_update_failed(db.products, product_id, "Product", expected_updated_at)
     
-    update_data = {k: v for k, v in product_data.model_dump().items() if v is not None}
-    update_data["updated_at"] = datetime.utcnow()
+    updated_product = {**existing_product, **update_data}
+    if "quantity" in update_data:
+        delta = update_data["quantity"] - existing_product.get("quantity", 0)
+        await record_movements(db, [movement(product_id, delta, ADMIN_ADJUSTMENT, admin.get("username"))])
+        await publish_low_stock(db, [product_id])
+    product_catalog.upsert(updated_product)
     
-    await db.products.update_one({"id": product_id}, {"$set": update_data})
+    # Back in stock: fan out Notify Me messages in the background
+    if existing_product.get("quantity", 0) <= 0 and updated_product.get("quantity", 0) > 0:
+        schedule_restock_notifications(db, updated_product)
     
-    updated_product = await db.products.find_one({"id": product_id}, {"_id": 0})
     return Product(**updated_product)
 
 @admin_router.delete("/products/{product_id}")
@@ -169,6 +251,8 @@ async def delete_product(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Product not found")
     
+    product_catalog.remove(product_id)
+    
     return {"message": "Product deleted successfully"}
 
 # ==================== NOTIFY ME REQUESTS ====================
@@ -176,23 +260,29 @@ async def delete_product(
 @admin_router.get("/notify-requests")
 async def get_notify_requests(
     admin: dict = Depends(verify_admin_token),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_reporting_db)
 ):
-    """Get all notify requests grouped by product"""
-    # Use $lookup to join product details in a single query (optimized, no N+1)
+    """Get notify request counts grouped by product"""
+    # Count per product without pushing every request into the group, then join
+    # only the product names through a pipeline-form $lookup
     pipeline = [
         {
             "$group": {
                 "_id": "$product_id",
                 "count": {"$sum": 1},
-                "requests": {"$push": {"phone": "$phone", "name": "$name", "created_at": "$created_at"}}
+                "latest_request_at": {"$max": "$created_at"}
             }
         },
+        {"$sort": {"count": -1}},
         {
             "$lookup": {
                 "from": "products",
-                "localField": "_id",
-                "foreignField": "id",
+                "let": {"product_id": "$_id"},
+                "pipeline": [
+                    {"$match": {"$expr": {"$eq": ["$id", "$$product_id"]}}},
+                    {"$project": {"_id": 0, "name_en": 1, "name_ar": 1}},
+                    {"$limit": 1}
+                ],
                 "as": "product"
             }
         },
@@ -203,7 +293,7 @@ async def get_notify_requests(
             "$project": {
                 "_id": 1,
                 "count": 1,
-                "requests": 1,
+                "latest_request_at": 1,
                 "product_name_en": {"$ifNull": ["$product.name_en", "Unknown"]},
                 "product_name_ar": {"$ifNull": ["$product.name_ar", "غير معروف"]}
             }
@@ -216,11 +306,16 @@ async def get_notify_requests(
 @admin_router.get("/notify-requests/{product_id}")
 async def get_product_notify_requests(
     product_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
     admin: dict = Depends(verify_admin_token),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_reporting_db)
 ):
-    """Get all notify requests for a specific product"""
-    requests = await db.notify_requests.find({"product_id": product_id}, {"_id": 0}).to_list(1000)
+    """Get one page of notify requests for a specific product, newest first"""
+    requests = await db.notify_requests.find(
+        {"product_id": product_id},
+        {"_id": 0}
+    ).sort("created_at", -1).skip(skip).limit(limit).to_list(limit)
     return requests
 
 # ==================== ORDER MANAGEMENT ====================
@@ -243,8 +338,8 @@ async def get_all_orders(
         else:
             query["confirmation_status"] = confirmation_status
     
-    orders = await db.orders.find(query, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return orders
+    orders = await db.orders.find(query, model_projection(Order)).sort("created_at", -1).to_list(1000)
+    return trusted_response(Order, orders)
 
 @admin_router.get("/orders/{order_id}", response_model=Order)
 async def get_order(
@@ -266,8 +361,7 @@ async def update_order_status(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Update order status"""
-    valid_statuses = ["Pending", "Confirmed", "Shipped", "Delivered", "Cancelled"]
-    if status_update.status not in valid_statuses:
+    if status_update.status not in ORDER_STATUSES:
         raise HTTPException(status_code=400, detail="Invalid status")
     
     result = await db.orders.update_one(
@@ -278,6 +372,7 @@ async def update_order_status(
     if result.matched_count == 0:
         raise HTTPException(status_code=404, detail="Order not found")
     
+    publish_orders_updated([order_id], {"status": status_update.status})
     return {"message": "Order status updated successfully"}
 
 @admin_router.delete("/orders/{order_id}")
@@ -287,33 +382,156 @@ async def delete_order(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Delete an order"""
-    # Find the order first to restore stock if needed
-    order = await db.orders.find_one({"id": order_id}, {"_id": 0})
+    # Delete first and restore from what was deleted, so a concurrent delete or cancel
+    # of the same order can't restore its stock a second time
+    order = await db.orders.find_one_and_delete({"id": order_id}, {"_id": 0})
     if not order:
         raise HTTPException(status_code=404, detail="Order not found")
     
     # Restore product quantities if order was not cancelled
     if order.get("status") != "Cancelled":
-        for item in order.get("items", []):
-            await db.products.update_one(
-                {"id": item.get("product_id")},
-                {"$inc": {"quantity": item.get("quantity", 0)}}
-            )
+        await restore_stock(db, [order], ORDER_DELETED)
     
-    # Delete the order
-    result = await db.orders.delete_one({"id": order_id})
+    return {"message": "Order deleted successfully"}
+
+def _bulk_order_ids(order_ids: List[str]) -> List[str]:
+    order_ids = list(dict.fromkeys(order_ids))
+    if not order_ids:
+        raise HTTPException(status_code=400, detail="No orders given")
+    if len(order_ids) > MAX_BULK_ORDERS:
+        raise HTTPException(status_code=400, detail=f"At most {MAX_BULK_ORDERS} orders per request")
+    return order_ids
+
+@admin_router.post("/orders/bulk-status")
+async def bulk_update_order_status(
+    bulk_update: OrderBulkStatusUpdate,
+    admin: dict = Depends(verify_admin_token),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Set the status of many orders with one update_many
+    Cancelling releases stock (one bulk_write for all orders); cancelled orders are
+    not moved to another status, since their stock has already been released.
+    Returns a result per order: updated, unchanged, skipped or not_found
+    """
+    if bulk_update.status not in ORDER_STATUSES:
+        raise HTTPException(status_code=400, detail="Invalid status")
+    order_ids = _bulk_order_ids(bulk_update.order_ids)
+    
+    orders = await db.orders.find({"id": {"$in": order_ids}}, {"_id": 0, "id": 1, "status": 1}).to_list(None)
+    current_status = {order["id"]: order.get("status") for order in orders}
+    targets = [
+        order_id for order_id in order_ids
+        if order_id in current_status
+        and current_status[order_id] != bulk_update.status
+        and current_status[order_id] != "Cancelled"
+    ]
     
-    if result.deleted_count == 0:
-        raise HTTPException(status_code=404, detail="Order not found")
+    updated = set()
+    restored = {}
+    if targets:
+        now = datetime.utcnow()
+        if bulk_update.status == "Cancelled":
+            # Tag the orders this request actually cancels so stock is released exactly once,
+            # and close their WhatsApp confirmation so the customer's reply or expiry can't release it again
+            batch_id = uuid.uuid4().hex
+            with span("bulk_update_order_status.cancel"):
+                await db.orders.update_many(
+                    {"id": {"$in": targets}, "status": {"$ne": "Cancelled"}},
+                    [{"$set": {
+                        "status": "Cancelled",
+                        "confirmation_status": {"$cond": [
+                            {"$eq": ["$confirmation_status", "pending"]}, "cancelled", "$confirmation_status"
+                        ]},
+                        "status_batch_id": batch_id,
+                        "updated_at": now
+                    }}]
+                )
+                cancelled = await db.orders.find(
+                    {"id": {"$in": targets}, "status_batch_id": batch_id},
+                    {"_id": 0, "id": 1, "items.product_id": 1, "items.quantity": 1}
+                ).to_list(None)
+            with span("bulk_update_order_status.restore_stock"):
+                restored = await restore_stock(db, cancelled)
+            updated = {order["id"] for order in cancelled}
+            publish_orders_updated(updated, {"status": "Cancelled"})
+        else:
+            # Tagged like the cancel path, so the result reports what this write changed rather
+            # than what the earlier read expected (an order cancelled meanwhile is skipped)
+            batch_id = uuid.uuid4().hex
+            with span("bulk_update_order_status.update"):
+                await db.orders.update_many(
+                    {"id": {"$in": targets}, "status": {"$nin": ["Cancelled", bulk_update.status]}},
+                    {"$set": {"status": bulk_update.status, "status_batch_id": batch_id, "updated_at": now}}
+                )
+                changed = await db.orders.find(
+                    {"id": {"$in": targets}, "status_batch_id": batch_id}, {"_id": 0, "id": 1}
+                ).to_list(None)
+            updated = {order["id"] for order in changed}
+            publish_orders_updated(updated, {"status": bulk_update.status})
+    
+    results = []
+    for order_id in order_ids:
+        if order_id not in current_status:
+            result = "not_found"
+        elif order_id in updated:
+            result = "updated"
+        elif current_status[order_id] == bulk_update.status:
+            result = "unchanged"
+        else:
+            result = "skipped"
+        results.append({"order_id": order_id, "result": result})
     
-    return {"message": "Order deleted successfully"}
+    return {
+        "updated": len(updated),
+        "stock_restored": restored,
+        "results": results
+    }
+
+@admin_router.post("/orders/bulk-delete")
+async def bulk_delete_orders(
+    bulk_delete: OrderBulkDelete,
+    admin: dict = Depends(verify_admin_token),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Delete many orders
+    Each order is claimed by deleting it (find_one_and_delete), so an order removed
+    or cancelled by an overlapping request has its stock restored only once; stock
+    of the orders deleted here that were not cancelled is restored with one bulk_write
+    Returns a result per order: deleted or not_found
+    """
+    order_ids = _bulk_order_ids(bulk_delete.order_ids)
+    
+    with span("bulk_delete_orders.delete"):
+        deleted = await asyncio.gather(*(
+            db.orders.find_one_and_delete(
+                {"id": order_id},
+                {"_id": 0, "id": 1, "status": 1, "items.product_id": 1, "items.quantity": 1}
+            )
+            for order_id in order_ids
+        ))
+    orders = [order for order in deleted if order is not None]
+    found = {order["id"] for order in orders}
+    
+    with span("bulk_delete_orders.restore_stock"):
+        restored = await restore_stock(db, [order for order in orders if order.get("status") != "Cancelled"], ORDER_DELETED)
+    
+    return {
+        "deleted": len(orders),
+        "stock_restored": restored,
+        "results": [
+            {"order_id": order_id, "result": "deleted" if order_id in found else "not_found"}
+            for order_id in order_ids
+        ]
+    }
 
 # ==================== CUSTOMER MANAGEMENT ====================
 
 @admin_router.get("/customers")
 async def get_customers(
     admin: dict = Depends(verify_admin_token),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_reporting_db)
 ):
     """Get all customers with their order statistics"""
     # Get unique customers from orders
@@ -335,12 +553,14 @@ async def get_customers(
         {"$sort": {"total_orders": -1}}
     ]
     
-    customers = await db.orders.aggregate(pipeline).to_list(1000)
+    with span("get_customers.aggregate"):
+        customers = await db.orders.aggregate(pipeline).to_list(1000)
     
     # Check if customer is blocked
-    for customer in customers:
-        blocked_customer = await db.blocked_customers.find_one({"phone": customer["_id"]})
-        customer["is_blocked"] = blocked_customer is not None if blocked_customer else False
+    with span("get_customers.blocked_lookup"):
+        for customer in customers:
+            blocked_customer = await db.blocked_customers.find_one({"phone": {"$in": phone_variants(customer["_id"])}})
+            customer["is_blocked"] = blocked_customer is not None if blocked_customer else False
     
     return customers
 
@@ -351,7 +571,7 @@ async def block_customer(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Block a customer"""
-    await db.blocked_customers.insert_one({"phone": phone, "blocked_at": datetime.utcnow()})
+    await db.blocked_customers.insert_one({"phone": normalize_saudi_phone(phone), "blocked_at": datetime.utcnow()})
     return {"message": "Customer blocked successfully"}
 
 @admin_router.delete("/customers/{phone}/block")
@@ -361,7 +581,7 @@ async def unblock_customer(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Unblock a customer"""
-    await db.blocked_customers.delete_one({"phone": phone})
+    await db.blocked_customers.delete_many({"phone": {"$in": phone_variants(phone)}})
     return {"message": "Customer unblocked successfully"}
 
 @admin_router.get("/customers/{phone}/orders")
@@ -371,8 +591,8 @@ async def get_customer_orders(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Get all orders for a specific customer"""
-    orders = await db.orders.find({"phone": phone}, {"_id": 0}).sort("created_at", -1).to_list(1000)
-    return orders
+    orders = await db.orders.find({"phone": {"$in": phone_variants(phone)}}, {"_id": 0}).sort("created_at", -1).to_list(1000)
+    return TrustedJSONResponse(orders)
 
 # ==================== COUPON MANAGEMENT ====================
 
@@ -403,26 +623,40 @@ async def create_coupon(
     
     coupon = Coupon(**coupon_dict)
     await db.coupons.insert_one(coupon.model_dump())
+    coupon_cache.invalidate()
     return coupon
 
 @admin_router.put("/coupons/{coupon_id}", response_model=Coupon)
 async def update_coupon(
     coupon_id: str,
     coupon_data: CouponCreate,
+    if_match: Optional[str] = Header(None),
     admin: dict = Depends(verify_admin_token),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Update a coupon"""
-    existing_coupon = await db.coupons.find_one({"id": coupon_id}, {"_id": 0})
-    if not existing_coupon:
-        raise HTTPException(status_code=404, detail="Coupon not found")
-    
+    """
+    Update a coupon
+    With If-Match set to the coupon's updated_at, a concurrent change returns 409.
+    """
     update_data = coupon_data.model_dump()
     update_data["code"] = update_data["code"].upper()
+    update_data["updated_at"] = write_timestamp()
+    
+    query = {"id": coupon_id}
+    expected_updated_at = _expected_updated_at(if_match)
+    if expected_updated_at is not None:
+        query["updated_at"] = expected_updated_at
+    
+    updated_coupon = await db.coupons.find_one_and_update(
+        query,
+        {"$set": update_data},
+        projection={"_id": 0},
+        return_document=ReturnDocument.AFTER
+    )
+    if not updated_coupon:
+        await _raise_update_failed(db.coupons, coupon_id, "Coupon", expected_updated_at)
     
-    await db.coupons.update_one({"id": coupon_id}, {"$set": update_data})
-    
-    updated_coupon = await db.coupons.find_one({"id": coupon_id}, {"_id": 0})
+    coupon_cache.invalidate()
     return Coupon(**updated_coupon)
 
 @admin_router.delete("/coupons/{coupon_id}")
@@ -436,14 +670,76 @@ async def delete_coupon(
     if result.deleted_count == 0:
         raise HTTPException(status_code=404, detail="Coupon not found")
     
+    coupon_cache.invalidate()
+    
     return {"message": "Coupon deleted successfully"}
 
+# ==================== INVENTORY ====================
+
+@admin_router.get("/inventory/{product_id}/movements")
+async def get_inventory_movements(
+    product_id: str,
+    skip: int = Query(0, ge=0),
+    limit: int = Query(100, ge=1, le=500),
+    admin: dict = Depends(verify_admin_token),
+    db: AsyncIOMotorDatabase = Depends(get_reporting_db)
+):
+    """Get one page of a product's stock movements, newest first"""
+    movements = await db.inventory_movements.find(
+        {"product_id": product_id},
+        {"_id": 0}
+    ).sort("_id", -1).skip(skip).limit(limit).to_list(limit)
+    return movements
+
+@admin_router.post("/inventory/reconcile")
+async def run_inventory_reconciliation(
+    repair: Optional[str] = Query(None, description="actual: accept current quantities; ledger: restore ledger balances"),
+    admin: dict = Depends(verify_admin_token),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Compare product quantities with the inventory ledger, optionally repairing drift"""
+    if repair is not None and repair not in REPAIR_MODES:
+        raise HTTPException(status_code=400, detail=f"repair must be one of: {', '.join(REPAIR_MODES)}")
+    with span("reconcile_inventory"):
+        return await reconcile_inventory(db, repair=repair)
+
+# ==================== LIVE FEED ====================
+
+@admin_router.post("/events/ticket")
+async def create_event_stream_ticket(
+    admin: dict = Depends(verify_admin_token),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """Single-use ticket for opening the event stream, which can't carry the Authorization header"""
+    return await issue_stream_ticket(db, admin.get("username"))
+
+@admin_router.get("/events/stream")
+async def stream_admin_events(
+    ticket: str = Query(...),
+    after: Optional[str] = Query(None),
+    last_event_id: Optional[str] = Header(None),
+    db: AsyncIOMotorDatabase = Depends(get_db)
+):
+    """
+    Server-Sent Events: order_created, order_updated and low_stock as they happen
+    Open with a ticket from POST /events/ticket; resume with Last-Event-ID or ?after=<event id>.
+    A "reset" event means events were missed and the client should refetch.
+    The stream ends after a few minutes or when the server drains; reconnect with a new ticket.
+    """
+    if not await redeem_stream_ticket(db, ticket):
+        raise HTTPException(status_code=401, detail="Invalid or expired stream ticket")
+    return StreamingResponse(
+        admin_events.stream(last_event_id or after),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
 # ==================== DASHBOARD STATS ====================
 
 @admin_router.get("/dashboard/stats")
 async def get_dashboard_stats(
     admin: dict = Depends(verify_admin_token),
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_reporting_db)
 ):
     """Get dashboard statistics"""
     total_products = await db.products.count_documents({})
@@ -466,3 +762,19 @@ async def get_dashboard_stats(
         "total_customers": total_customers,
         "total_revenue": total_revenue
     }
+
+# ==================== DIAGNOSTICS ====================
+
+@admin_router.get("/diagnostics/slow-queries")
+async def get_slow_queries(
+    limit: int = Query(50, ge=1, le=200),
+    admin: dict = Depends(verify_admin_token)
+):
+    """Get recent slow MongoDB operations with sampled explain plans"""
+    entries = slow_query_listener.recent(limit)
+    return {
+        "threshold_ms": slow_query_listener.threshold_ms,
+        "explain_sample_rate": slow_query_listener.sample_rate,
+        "collscan_count": sum(1 for entry in entries if entry["collscan"]),
+        "entries": entries
+    }
@@ -1,25 +1,123 @@
-from fastapi import FastAPI
+from fastapi import FastAPI, Request
+from fastapi.responses import JSONResponse, PlainTextResponse
 from dotenv import load_dotenv
 from starlette.middleware.cors import CORSMiddleware
-from motor.motor_asyncio import AsyncIOMotorClient
-import os
+from contextlib import asynccontextmanager
+import asyncio
 import logging
+import os
+import signal
+import threading
 from pathlib import Path
 
+from logging_config import setup_logging, shutdown_logging, RequestIdMiddleware
+from metrics import MetricsMiddleware, mongo_command_listener, render_metrics
+from query_diagnostics import slow_query_listener
+from database import create_database, create_read_databases, ping
+from serialization import FastJSONResponse
+from compression import CompressionMiddleware
+
 from admin_routes import admin_router
 from public_routes import public_router
+from restock_notifier import start_restock_worker, stop_restock_worker
+from order_expiry import start_order_expiry_sweeper, stop_order_expiry_sweeper
+from inventory_reconciliation import start_inventory_reconciliation, stop_inventory_reconciliation
+from indexes import ensure_indexes
+from catalog_cache import product_catalog, coupon_cache
+from background import drain_background_tasks
+from admin_events import admin_events
 
 ROOT_DIR = Path(__file__).parent
 load_dotenv(ROOT_DIR / ".env")
 
-app = FastAPI()
+setup_logging()
+logger = logging.getLogger(__name__)
+
+# Seconds each shutdown phase may wait for outstanding work
+SHUTDOWN_DRAIN_TIMEOUT_SECONDS = float(os.environ.get("SHUTDOWN_DRAIN_TIMEOUT_SECONDS", "20"))
+# Seconds between SIGTERM and closing the listener, with /readyz reporting draining
+SHUTDOWN_PRE_STOP_SECONDS = float(os.environ.get("SHUTDOWN_PRE_STOP_SECONDS", "5"))
+
+async def warm_up(db):
+    """Open the first pooled connection, build indexes and fill the caches"""
+    if not await ping(db):
+        logger.warning("Database not reachable at startup; caches will fill on first use")
+        return
+    await ensure_indexes(db)
+    try:
+        await product_catalog.reload(db)
+        await coupon_cache.reload(db)
+    except Exception:
+        logger.exception("Cache warmup failed; caches will fill on first use")
+
+def start_draining(app: FastAPI) -> None:
+    """Stop advertising readiness and end admin feeds; other requests are still served until the server stops"""
+    if not app.state.draining:
+        logger.info("Draining: /readyz now reports 503")
+    app.state.draining = True
+    # Open event streams never finish on their own, and the server waits for every connection
+    admin_events.close_streams()
+
+def install_pre_stop_handler(app: FastAPI) -> None:
+    """
+    Hold SIGTERM for SHUTDOWN_PRE_STOP_SECONDS while /readyz reports draining
+
+    uvicorn closes the listening socket as soon as it sees SIGTERM and runs the
+    lifespan shutdown only after every connection has closed, so the load
+    balancer has to be told here, while requests are still accepted. After the
+    delay the server is stopped with SIGINT, which uvicorn also treats as a
+    graceful exit; a second SIGTERM skips the rest of the delay.
+    """
+    if threading.current_thread() is not threading.main_thread():
+        return
+    loop = asyncio.get_running_loop()
+
+    def stop_server() -> None:
+        signal.raise_signal(signal.SIGINT)
 
-MONGO_URL = os.getenv("MONGO_URL")
-if not MONGO_URL:
-    raise ValueError("MONGO_URL is missing")
+    def handle_sigterm() -> None:
+        if app.state.draining:
+            stop_server()
+            return
+        start_draining(app)
+        loop.call_later(SHUTDOWN_PRE_STOP_SECONDS, stop_server)
 
-client = AsyncIOMotorClient(MONGO_URL)
-db = client.get_default_database()
+    try:
+        loop.add_signal_handler(signal.SIGTERM, handle_sigterm)
+    except NotImplementedError:
+        # Windows: keep the server's own handler
+        pass
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    client, db = create_database(event_listeners=[mongo_command_listener, slow_query_listener])
+    app.state.mongo_client = client
+    app.state.db = db
+    app.state.read_dbs = create_read_databases(db)
+    app.state.draining = False
+
+    slow_query_listener.attach(asyncio.get_running_loop(), db)
+    await warm_up(db)
+    start_restock_worker()
+    start_order_expiry_sweeper(db)
+    start_inventory_reconciliation(db)
+    admin_events.start(db)
+    install_pre_stop_handler(app)
+
+    yield
+
+    # By now the server has stopped accepting and finished its requests (see
+    # install_pre_stop_handler); let queued work finish before the client goes away
+    start_draining(app)
+    await admin_events.stop()
+    await stop_order_expiry_sweeper()
+    await stop_inventory_reconciliation()
+    await stop_restock_worker(drain_timeout=SHUTDOWN_DRAIN_TIMEOUT_SECONDS)
+    await drain_background_tasks(SHUTDOWN_DRAIN_TIMEOUT_SECONDS)
+    client.close()
+    shutdown_logging()
+
+app = FastAPI(lifespan=lifespan, default_response_class=FastJSONResponse)
 
 app.add_middleware(
     CORSMiddleware,
@@ -28,12 +126,28 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"],
 )
+app.add_middleware(CompressionMiddleware)
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(MetricsMiddleware)
 
 app.include_router(admin_router, prefix="/admin")
 app.include_router(public_router, prefix="/api")
 
-logging.basicConfig(level=logging.INFO)
+@app.get("/healthz", include_in_schema=False)
+async def healthz(request: Request):
+    """Liveness: the process is serving; reports database reachability without failing on it"""
+    return {"status": "ok", "database": "up" if await ping(request.app.state.db) else "down"}
 
-@app.on_event("shutdown")
-async def shutdown():
-    client.close()
+@app.get("/readyz", include_in_schema=False)
+async def readyz(request: Request):
+    """Readiness: only accept traffic while the database answers a ping and we are not draining"""
+    if request.app.state.draining:
+        return JSONResponse({"status": "draining"}, status_code=503)
+    if not await ping(request.app.state.db):
+        return JSONResponse({"status": "unavailable", "database": "down"}, status_code=503)
+    return {"status": "ready", "database": "up"}
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus text exposition of the in-process metrics"""
+    return PlainTextResponse(render_metrics(), media_type="text/plain; version=0.0.4")
@@ -0,0 +1,43 @@
+"""
+Fire-and-forget background tasks that are still awaited on shutdown
+
+Work that must not delay the response (WhatsApp sends, cache refreshes) is
+spawned here instead of bare asyncio.create_task, so the lifespan can wait
+for it during a graceful drain instead of dropping it.
+"""
+import asyncio
+import logging
+from typing import Awaitable, Optional, Set
+
+logger = logging.getLogger(__name__)
+
+_tasks: Set[asyncio.Task] = set()
+
+
+def spawn(awaitable: Awaitable, name: Optional[str] = None) -> asyncio.Task:
+    """Run an awaitable in the background, keeping a reference until it finishes"""
+    task = asyncio.ensure_future(awaitable)
+    if name:
+        task.set_name(name)
+    _tasks.add(task)
+    task.add_done_callback(_on_done)
+    return task
+
+
+def _on_done(task: asyncio.Task) -> None:
+    _tasks.discard(task)
+    if not task.cancelled() and task.exception() is not None:
+        logger.error("Background task %s failed", task.get_name(), exc_info=task.exception())
+
+
+async def drain_background_tasks(timeout: float) -> None:
+    """Wait for spawned tasks to finish; cancel whatever is left after timeout seconds"""
+    if not _tasks:
+        return
+    pending = list(_tasks)
+    _, still_running = await asyncio.wait(pending, timeout=timeout)
+    for task in still_running:
+        task.cancel()
+    if still_running:
+        logger.warning("Cancelled %d background task(s) still running at shutdown", len(still_running))
+
@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+CPU cost of phone canonicalization on the order and webhook paths
+
+Compares the old normalizer (re.sub with an uncompiled pattern and a print
+per call, here line-buffered to /dev/null) against phone_utils'
+normalize_saudi_phone with its precompiled patterns, both without the LRU
+cache and with it, over a stream of numbers typed in mixed formats.
+
+Run from the backend directory:
+    python benchmarks/phone_normalization_benchmark.py [--calls 200000] [--customers 2000]
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+from typing import Callable, List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from phone_utils import normalize_saudi_phone  # noqa: E402
+
+FORMATS = ["+966{}", "966{}", "0{}", "{}", "00966{}", "+966 {} ", "whatsapp:+966{}"]
+
+_SINK = open(os.devnull, "w", buffering=1)
+
+
+def legacy_normalize(phone: str) -> str:
+    """The normalizer before phone_utils, kept here for comparison"""
+    if not phone:
+        return ""
+    phone = re.sub(r'[^\d+]', '', phone)
+    if phone.startswith('+'):
+        phone = phone[1:]
+    phone = phone.lstrip('0')
+    if phone.startswith('966'):
+        phone = '+' + phone
+    elif len(phone) == 9 and phone.startswith('5'):
+        phone = '+966' + phone
+    elif len(phone) >= 9 and phone[-9:].startswith('5'):
+        phone = '+966' + phone[-9:]
+    elif len(phone) >= 9:
+        phone = '+' + phone
+    else:
+        phone = '+966' + phone
+    print(f"Normalized phone: {phone}", file=_SINK)
+    return phone
+
+
+def make_phones(calls: int, customers: int) -> List[str]:
+    rng = random.Random(42)
+    numbers = [f"5{rng.randrange(10 ** 8):08d}" for _ in range(customers)]
+    return [rng.choice(FORMATS).format(rng.choice(numbers)) for _ in range(calls)]
+
+
+def cpu_us_per_call(normalize: Callable[[str], str], phones: List[str]) -> float:
+    started = time.process_time()
+    for phone in phones:
+        normalize(phone)
+    return (time.process_time() - started) * 1_000_000 / len(phones)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--calls", type=int, default=200000, help="phones normalized per case")
+    parser.add_argument("--customers", type=int, default=2000, help="distinct numbers in the stream")
+    args = parser.parse_args()
+
+    phones = make_phones(args.calls, args.customers)
+    normalize_saudi_phone.cache_clear()
+    legacy = cpu_us_per_call(legacy_normalize, phones)
+    uncached = cpu_us_per_call(normalize_saudi_phone.__wrapped__, phones)
+    cached = cpu_us_per_call(normalize_saudi_phone, phones)
+
+    print(f"{args.calls} calls over {args.customers} customers")
+    print(f"{'re.sub + print':<24}{legacy:>8.2f} us/call")
+    print(f"{'precompiled':<24}{uncached:>8.2f} us/call")
+    print(f"{'precompiled + LRU':<24}{cached:>8.2f} us/call  (hit rate {normalize_saudi_phone.cache_info().hits / len(phones):.0%})")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+"""
+CPU cost per request of serializing list endpoints
+
+Compares what FastAPI does for a route with response_model=List[Product]
+(validate every document, dump it in JSON mode, encode with json) against
+the trusted path used by get_products and get_all_orders (shape the dicts,
+encode with orjson).
+
+Run from the backend directory:
+    python benchmarks/serialization_benchmark.py [--documents 500] [--requests 200]
+"""
+import argparse
+import os
+import sys
+import time
+import uuid
+from datetime import datetime, timedelta
+from typing import List
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from fastapi.responses import JSONResponse  # noqa: E402
+from pydantic import TypeAdapter  # noqa: E402
+
+from models import Order, Product  # noqa: E402
+from serialization import FastJSONResponse, trusted_response  # noqa: E402
+
+
+def make_products(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "name_en": f"Rose Oud Perfume {index}",
+            "name_ar": f"عطر عود الورد {index}",
+            "description_en": "A warm blend of Taif rose, oud and amber for evening wear. " * 4,
+            "description_ar": "مزيج دافئ من ورد الطائف والعود والعنبر للمساء. " * 4,
+            "category": "perfume" if index % 2 else "drone",
+            "price": 250.0 + index,
+            "original_price": 300.0 + index,
+            "quantity": index % 7,
+            "images": [f"/api/uploads/products/{uuid.uuid4()}.jpg" for _ in range(3)],
+            "is_visible": True,
+            "rating": 4.5,
+            "reviews": index,
+            "specs": {"size": "100ml", "concentration": "EDP"},
+            "created_at": now - timedelta(days=index),
+            "updated_at": now,
+        }
+        for index in range(count)
+    ]
+
+
+def make_orders(count: int) -> List[dict]:
+    now = datetime.utcnow()
+    return [
+        {
+            "id": str(uuid.uuid4()),
+            "public_order_id": f"ZAY-{100001 + index}",
+            "customer_name": "Customer",
+            "phone": "+966501234567",
+            "city": "Riyadh",
+            "address": "King Fahd Road",
+            "items": [
+                {
+                    "product_id": str(uuid.uuid4()),
+                    "name_en": "Rose Oud Perfume",
+                    "name_ar": "عطر عود الورد",
+                    "price": 350.0,
+                    "quantity": 2,
+                    "image": "/api/uploads/products/a.jpg",
+                }
+                for _ in range(3)
+            ],
+            "subtotal": 2100.0,
+            "discount": 0.0,
+            "total": 2100.0,
+            "status": "Pending",
+            "confirmation_status": "pending",
+            "created_at": now - timedelta(minutes=index),
+            "updated_at": now,
+        }
+        for index in range(count)
+    ]
+
+
+def validated_body(adapter: TypeAdapter, response_class, documents: List[dict]) -> bytes:
+    """What FastAPI does with a response_model: validate, dump in JSON mode, render"""
+    content = adapter.dump_python(adapter.validate_python(documents), mode="json")
+    return response_class(content).body
+
+
+def cpu_ms_per_request(function, requests: int) -> float:
+    function()  # warm up
+    started = time.process_time()
+    for _ in range(requests):
+        function()
+    return (time.process_time() - started) * 1000 / requests
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--documents", type=int, default=500, help="documents per response")
+    parser.add_argument("--requests", type=int, default=200, help="requests timed per case")
+    args = parser.parse_args()
+
+    cases = [
+        ("products", Product, make_products(args.documents)),
+        ("orders", Order, make_orders(args.documents)),
+    ]
+    print(f"{args.documents} documents per response, {args.requests} requests per case")
+    print(f"{'endpoint':<10}{'response_model + json':>24}{'response_model + orjson':>26}{'trusted + orjson':>20}{'saved':>10}")
+    for name, model, documents in cases:
+        adapter = TypeAdapter(List[model])
+        baseline = cpu_ms_per_request(lambda: validated_body(adapter, JSONResponse, documents), args.requests)
+        default_class = cpu_ms_per_request(lambda: validated_body(adapter, FastJSONResponse, documents), args.requests)
+        trusted = cpu_ms_per_request(lambda: trusted_response(model, documents).body, args.requests)
+        print(
+            f"{name:<10}{baseline:>21.2f} ms{default_class:>23.2f} ms{trusted:>17.2f} ms"
+            f"{(1 - trusted / baseline) * 100:>9.0f}%"
+        )
+
+
+if __name__ == "__main__":
+    main()
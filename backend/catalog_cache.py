@@ -0,0 +1,158 @@
+"""
+In-process catalog caches
+
+ProductCatalog holds every product document (visible or not) keyed by id and
+ActiveCouponCache holds the active coupons, so hot read paths can answer from
+memory. Entries expire after a short TTL; admin product writes are applied to
+the catalog in place and admin coupon writes invalidate the coupon cache.
+
+Derived in-memory structures (search index, facet counts) subscribe to the
+catalog and are told about every reload, upsert and removal. Serialized
+responses built from a snapshot (with their compressed variants) are kept
+next to it and dropped whenever the snapshot changes.
+"""
+import asyncio
+import os
+import time
+from typing import Callable, Dict, Hashable, List, Optional, Protocol
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from compression import EncodedBody
+
+CATALOG_CACHE_TTL_SECONDS = float(os.environ.get("CATALOG_CACHE_TTL_SECONDS", "30"))
+
+
+class CatalogListener(Protocol):
+    def on_catalog_reload(self, products: Dict[str, dict]) -> None: ...
+
+    def on_product_upsert(self, product: dict) -> None: ...
+
+    def on_product_remove(self, product_id: str) -> None: ...
+
+
+class EncodedBodies:
+    """Serialized responses derived from one cache snapshot"""
+
+    def __init__(self):
+        self._bodies: Dict[Hashable, EncodedBody] = {}
+
+    def get(self, key: Hashable, build: Callable[[], bytes]) -> EncodedBody:
+        encoded = self._bodies.get(key)
+        if encoded is None:
+            encoded = self._bodies[key] = EncodedBody(build())
+        return encoded
+
+    def clear(self) -> None:
+        self._bodies = {}
+
+
+class ProductCatalog:
+    """Lazily loaded snapshot of the products collection"""
+
+    def __init__(self, ttl_seconds: float = CATALOG_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self.version = 0
+        self._products: Dict[str, dict] = {}
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self._listeners: List[CatalogListener] = []
+        self.encoded_bodies = EncodedBodies()
+
+    def subscribe(self, listener: CatalogListener) -> None:
+        self._listeners.append(listener)
+        if self._loaded_at is not None:
+            listener.on_catalog_reload(self._products)
+
+    def is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    async def get_all(self, db: AsyncIOMotorDatabase) -> Dict[str, dict]:
+        """Return all products keyed by id, reloading once the TTL has passed"""
+        if self.is_fresh():
+            return self._products
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            # Another request may have reloaded while we waited for the lock
+            if not self.is_fresh():
+                await self.reload(db)
+        return self._products
+
+    async def get(self, db: AsyncIOMotorDatabase, product_id: str) -> Optional[dict]:
+        """Return a single product or None"""
+        products = await self.get_all(db)
+        return products.get(product_id)
+
+    async def reload(self, db: AsyncIOMotorDatabase) -> None:
+        products = await db.products.find({}, {"_id": 0}).to_list(None)
+        self._products = {product["id"]: product for product in products}
+        self._loaded_at = time.monotonic()
+        self.version += 1
+        self.encoded_bodies.clear()
+        for listener in self._listeners:
+            listener.on_catalog_reload(self._products)
+
+    def upsert(self, product: dict) -> None:
+        """Apply an admin write without reloading the whole catalog"""
+        if self._loaded_at is None:
+            return
+        # Copy on write so callers iterating the previous snapshot are unaffected
+        self._products = {**self._products, product["id"]: product}
+        self.version += 1
+        self.encoded_bodies.clear()
+        for listener in self._listeners:
+            listener.on_product_upsert(product)
+
+    def remove(self, product_id: str) -> None:
+        if self._loaded_at is None:
+            return
+        self._products = {k: v for k, v in self._products.items() if k != product_id}
+        self.version += 1
+        self.encoded_bodies.clear()
+        for listener in self._listeners:
+            listener.on_product_remove(product_id)
+
+    def invalidate(self) -> None:
+        """Drop the snapshot so the next read reloads from the database"""
+        self._loaded_at = None
+
+
+product_catalog = ProductCatalog()
+
+
+class ActiveCouponCache:
+    """Lazily loaded list of coupons with is_active set; expiry is checked by the caller"""
+
+    def __init__(self, ttl_seconds: float = CATALOG_CACHE_TTL_SECONDS):
+        self.ttl_seconds = ttl_seconds
+        self._coupons: List[dict] = []
+        self._loaded_at: Optional[float] = None
+        self._lock: Optional[asyncio.Lock] = None
+        self.encoded_bodies = EncodedBodies()
+
+    def is_fresh(self) -> bool:
+        return self._loaded_at is not None and time.monotonic() - self._loaded_at < self.ttl_seconds
+
+    async def get_all(self, db: AsyncIOMotorDatabase) -> List[dict]:
+        if self.is_fresh():
+            return self._coupons
+
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.is_fresh():
+                await self.reload(db)
+        return self._coupons
+
+    async def reload(self, db: AsyncIOMotorDatabase) -> None:
+        self._coupons = await db.coupons.find({"is_active": True}, {"_id": 0}).to_list(None)
+        self._loaded_at = time.monotonic()
+        self.encoded_bodies.clear()
+
+    def invalidate(self) -> None:
+        self._loaded_at = None
+
+
+coupon_cache = ActiveCouponCache()
@@ -0,0 +1,157 @@
+"""
+MongoDB client construction and the request-scoped database dependency
+
+The client is built once by the application lifespan through a pluggable
+factory (DB_BACKEND) and stored on app.state; routes receive the database
+handle from there through get_db (primary, for stock checks and writes) or
+through get_catalog_db / get_reporting_db, which may read from secondaries.
+"""
+import asyncio
+import importlib
+import importlib.util
+import os
+from typing import Callable, Dict, List, Optional, Tuple
+
+from fastapi import Request
+from motor.motor_asyncio import AsyncIOMotorClient, AsyncIOMotorDatabase
+from pymongo.read_preferences import Nearest, Primary, PrimaryPreferred, Secondary, SecondaryPreferred
+
+# Wire compressors in preference order and the module each one needs
+_COMPRESSOR_MODULES = {"zstd": "zstandard", "snappy": "snappy", "zlib": "zlib"}
+
+
+_READ_PREFERENCE_MODES = {
+    "primary": Primary,
+    "primaryPreferred": PrimaryPreferred,
+    "secondary": Secondary,
+    "secondaryPreferred": SecondaryPreferred,
+    "nearest": Nearest,
+}
+
+# Read profile -> (mode env var, default mode)
+READ_PROFILES = {
+    "catalog": ("MONGO_CATALOG_READ_PREFERENCE", "secondaryPreferred"),
+    "reporting": ("MONGO_REPORTING_READ_PREFERENCE", "secondaryPreferred"),
+}
+
+
+def _env_int(name: str, default: int) -> int:
+    return int(os.environ.get(name, default))
+
+
+def available_compressors(requested: str) -> List[str]:
+    """Keep only compressors whose module is installed so pymongo doesn't warn at startup"""
+    compressors = []
+    for name in (c.strip() for c in requested.split(",")):
+        module = _COMPRESSOR_MODULES.get(name)
+        if module and importlib.util.find_spec(module) is not None:
+            compressors.append(name)
+    return compressors
+
+
+def client_options() -> dict:
+    """Pool, timeout, compression and read preference settings for the Mongo client"""
+    options = {
+        "maxPoolSize": _env_int("MONGO_MAX_POOL_SIZE", 100),
+        "minPoolSize": _env_int("MONGO_MIN_POOL_SIZE", 0),
+        "maxIdleTimeMS": _env_int("MONGO_MAX_IDLE_TIME_MS", 300000),
+        "waitQueueTimeoutMS": _env_int("MONGO_WAIT_QUEUE_TIMEOUT_MS", 2000),
+        "serverSelectionTimeoutMS": _env_int("MONGO_SERVER_SELECTION_TIMEOUT_MS", 5000),
+        "connectTimeoutMS": _env_int("MONGO_CONNECT_TIMEOUT_MS", 5000),
+        "socketTimeoutMS": _env_int("MONGO_SOCKET_TIMEOUT_MS", 10000),
+        "readPreference": os.environ.get("MONGO_READ_PREFERENCE", "primary"),
+        "appname": os.environ.get("MONGO_APP_NAME", "zaylux-backend"),
+    }
+    compressors = available_compressors(os.environ.get("MONGO_COMPRESSORS", "zstd,snappy,zlib"))
+    if compressors:
+        options["compressors"] = compressors
+    return options
+
+
+def create_motor_client(mongo_url: Optional[str], event_listeners: list) -> AsyncIOMotorClient:
+    """Real MongoDB through Motor (production default)"""
+    if not mongo_url:
+        raise ValueError("MONGO_URL is missing")
+    return AsyncIOMotorClient(mongo_url, event_listeners=event_listeners, **client_options())
+
+
+def create_mongomock_client(mongo_url: Optional[str], event_listeners: list):
+    """In-memory database for tests and local benchmarks; needs mongomock-motor (requirements-test.txt)"""
+    try:
+        mongomock_motor = importlib.import_module("mongomock_motor")
+    except ImportError:
+        raise ValueError("DB_BACKEND=mongomock requires the mongomock-motor package")
+    # Command monitoring does not apply to the in-memory backend
+    return mongomock_motor.AsyncMongoMockClient(mongo_url or "mongodb://localhost")
+
+
+# DB_BACKEND name -> factory(mongo_url, event_listeners) returning a Motor-compatible client
+CLIENT_FACTORIES: Dict[str, Callable] = {
+    "motor": create_motor_client,
+    "mongomock": create_mongomock_client,
+}
+
+
+def register_client_factory(name: str, factory: Callable) -> None:
+    CLIENT_FACTORIES[name] = factory
+
+
+def create_database(event_listeners: Optional[list] = None) -> Tuple[AsyncIOMotorClient, AsyncIOMotorDatabase]:
+    """Build the client selected by DB_BACKEND and return it with the default database"""
+    backend = os.environ.get("DB_BACKEND", "motor")
+    factory = CLIENT_FACTORIES.get(backend)
+    if factory is None:
+        raise ValueError(f"Unknown DB_BACKEND: {backend}")
+
+    client = factory(os.environ.get("MONGO_URL"), event_listeners or [])
+    # Resolve the name (from MONGO_URL, else MONGO_DB_NAME) and then index the client:
+    # mongomock-motor's get_default_database hands back an unwrapped, synchronous database
+    name = client.get_default_database(default=os.environ.get("MONGO_DB_NAME", "zaylux")).name
+    return client, client[name]
+
+
+def make_read_preference(mode: str, max_staleness_seconds: int = -1):
+    """Build a read preference; staleness bounds only apply to non-primary modes"""
+    mode_class = _READ_PREFERENCE_MODES.get(mode)
+    if mode_class is None:
+        raise ValueError(f"Unknown read preference: {mode}")
+    if mode_class is Primary:
+        return Primary()
+    return mode_class(max_staleness=max_staleness_seconds)
+
+
+def create_read_databases(db: AsyncIOMotorDatabase) -> Dict[str, AsyncIOMotorDatabase]:
+    """
+    Database handles per read profile, sharing the primary handle's connection pool
+    MongoDB requires MONGO_MAX_STALENESS_SECONDS to be at least 90 (-1 disables the bound)
+    """
+    max_staleness = _env_int("MONGO_MAX_STALENESS_SECONDS", 120)
+    read_dbs = {}
+    for profile, (env_name, default_mode) in READ_PROFILES.items():
+        read_preference = make_read_preference(os.environ.get(env_name, default_mode), max_staleness)
+        read_dbs[profile] = db.client.get_database(db.name, read_preference=read_preference)
+    return read_dbs
+
+
+def get_db(request: Request) -> AsyncIOMotorDatabase:
+    """Dependency returning the primary database handle created by the application lifespan"""
+    return request.app.state.db
+
+
+def get_catalog_db(request: Request) -> AsyncIOMotorDatabase:
+    """Catalog and order-tracking reads; may be served by a secondary with bounded staleness"""
+    return request.app.state.read_dbs["catalog"]
+
+
+def get_reporting_db(request: Request) -> AsyncIOMotorDatabase:
+    """Admin reports and aggregations; kept off the primary so they never slow checkout writes"""
+    return request.app.state.read_dbs["reporting"]
+
+
+async def ping(db: AsyncIOMotorDatabase, timeout: float = 2.0) -> bool:
+    """True if the database answers a ping within timeout seconds"""
+    try:
+        await asyncio.wait_for(db.command("ping"), timeout)
+        return True
+    except Exception:
+        return False
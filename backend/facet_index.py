@@ -0,0 +1,155 @@
+"""
+Precomputed facet counts for product browsing
+
+Every visible product is filed under one value per facet: category, price
+bucket, in_stock and a few specs keys (spec.<key>). Each (facet, value) keeps
+the set of product ids, so counts for a filter are set intersections in
+memory instead of a $group per request.
+
+Counts follow the usual sidebar convention: a facet's own selection is left
+out when counting that facet, so selecting "drone" still shows how many
+perfumes there are.
+
+The index subscribes to the product catalog cache and is updated on every
+reload, upsert and removal.
+"""
+import os
+from collections import defaultdict
+from typing import Dict, Iterable, List, Optional, Set
+
+from catalog_cache import product_catalog
+
+# Price bucket lower bounds (SAR); the last bucket is open ended
+PRICE_BUCKETS = [
+    float(bound) for bound in os.environ.get("FACET_PRICE_BUCKETS", "0,250,500,1000,2500,5000").split(",") if bound
+]
+# specs keys exposed as facets, e.g. spec.camera
+SPEC_FACET_KEYS = [
+    key.strip() for key in os.environ.get("FACET_SPEC_KEYS", "camera,flightTime,range").split(",") if key.strip()
+]
+SPEC_FACET_PREFIX = "spec."
+
+Filters = Dict[str, Set[str]]
+
+
+def _format_bound(value: float) -> str:
+    return str(int(value)) if value == int(value) else str(value)
+
+
+def price_bucket(price: float) -> str:
+    """Label of the bucket a price falls in, e.g. "250-500" or "5000+" """
+    lower = None
+    for index, bound in enumerate(PRICE_BUCKETS):
+        if price < bound:
+            break
+        lower = index
+    if lower is None:
+        return f"0-{_format_bound(PRICE_BUCKETS[0])}"
+    if lower == len(PRICE_BUCKETS) - 1:
+        return f"{_format_bound(PRICE_BUCKETS[lower])}+"
+    return f"{_format_bound(PRICE_BUCKETS[lower])}-{_format_bound(PRICE_BUCKETS[lower + 1])}"
+
+
+def product_facet_values(product: dict) -> Dict[str, str]:
+    values = {
+        "category": product.get("category") or "",
+        "price": price_bucket(product.get("price") or 0),
+        "in_stock": "true" if product.get("quantity", 0) > 0 else "false",
+    }
+    specs = product.get("specs") or {}
+    for key in SPEC_FACET_KEYS:
+        if specs.get(key) not in (None, ""):
+            values[SPEC_FACET_PREFIX + key] = str(specs[key])
+    return values
+
+
+class ProductFacetIndex:
+    def __init__(self):
+        # facet -> value -> ids of visible products with that value
+        self._postings: Dict[str, Dict[str, Set[str]]] = defaultdict(lambda: defaultdict(set))
+        # product id -> its facet values, for removal
+        self._products: Dict[str, Dict[str, str]] = {}
+
+    # ---- catalog listener ----
+
+    def on_catalog_reload(self, products: Dict[str, dict]) -> None:
+        self._postings.clear()
+        self._products.clear()
+        for product in products.values():
+            self._add(product)
+
+    def on_product_upsert(self, product: dict) -> None:
+        self._remove(product["id"])
+        self._add(product)
+
+    def on_product_remove(self, product_id: str) -> None:
+        self._remove(product_id)
+
+    # ---- indexing ----
+
+    def _add(self, product: dict) -> None:
+        if not product.get("is_visible", True):
+            return
+        values = product_facet_values(product)
+        for facet, value in values.items():
+            self._postings[facet][value].add(product["id"])
+        self._products[product["id"]] = values
+
+    def _remove(self, product_id: str) -> None:
+        values = self._products.pop(product_id, None)
+        if values is None:
+            return
+        for facet, value in values.items():
+            ids = self._postings[facet][value]
+            ids.discard(product_id)
+            if not ids:
+                del self._postings[facet][value]
+
+    # ---- querying ----
+
+    def _matching(self, filters: Filters, skip_facet: Optional[str] = None) -> Optional[Set[str]]:
+        """Ids matching every filter except skip_facet; None means no constraint"""
+        matched: Optional[Set[str]] = None
+        # Narrowest facet first keeps the intersections small
+        selections = [
+            set().union(*(self._postings.get(facet, {}).get(value, set()) for value in values))
+            for facet, values in filters.items()
+            if facet != skip_facet and values
+        ]
+        for ids in sorted(selections, key=len):
+            matched = ids if matched is None else matched & ids
+            if not matched:
+                break
+        return matched
+
+    def matching_ids(self, filters: Filters) -> Set[str]:
+        matched = self._matching(filters)
+        return set(self._products) if matched is None else matched
+
+    def counts(self, filters: Filters) -> Dict[str, Dict[str, int]]:
+        """Per facet value counts of visible products under the other facets' filters"""
+        result: Dict[str, Dict[str, int]] = {}
+        for facet in self.facets():
+            base = self._matching(filters, skip_facet=facet)
+            result[facet] = {
+                value: len(ids) if base is None else len(ids & base)
+                for value, ids in sorted(self._postings[facet].items())
+            }
+        return result
+
+    def facets(self) -> List[str]:
+        fixed = ["category", "price", "in_stock"]
+        return fixed + [SPEC_FACET_PREFIX + key for key in SPEC_FACET_KEYS if SPEC_FACET_PREFIX + key in self._postings]
+
+
+def parse_facet_filters(params: Iterable) -> Filters:
+    """Facet filters from query parameters: ?category=drone&price=0-250&spec.camera=4K%2060fps"""
+    filters: Filters = defaultdict(set)
+    for name, value in params:
+        if name in ("category", "price", "in_stock") or name.startswith(SPEC_FACET_PREFIX):
+            filters[name].add(value)
+    return dict(filters)
+
+
+product_facet_index = ProductFacetIndex()
+product_catalog.subscribe(product_facet_index)
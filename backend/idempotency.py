@@ -0,0 +1,122 @@
+"""
+Idempotency-Key support for POST endpoints, and webhook message deduplication
+
+The first request with a key claims it by inserting a document whose _id is
+the key, so concurrent duplicates are collapsed by the _id unique index
+rather than a read-then-write check. When the request succeeds the response
+is stored on that document and later requests with the same key replay it.
+Keys expire through a TTL index on created_at.
+
+Inbound webhook messages are deduplicated the same way, keyed by the
+provider's message id (Twilio MessageSid) in processed_messages.
+"""
+import hashlib
+import os
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import HTTPException
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo.errors import DuplicateKeyError
+
+IDEMPOTENCY_KEY_TTL_SECONDS = int(os.environ.get("IDEMPOTENCY_KEY_TTL_SECONDS", str(24 * 60 * 60)))
+# A claim still "processing" after this long belongs to a crashed worker and may be taken over
+IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS = int(os.environ.get("IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS", "60"))
+MAX_IDEMPOTENCY_KEY_LENGTH = 255
+# Twilio retries within minutes; keep seen message ids well beyond that
+PROCESSED_MESSAGE_TTL_SECONDS = int(os.environ.get("PROCESSED_MESSAGE_TTL_SECONDS", str(48 * 60 * 60)))
+
+
+def request_fingerprint(body: str) -> str:
+    return hashlib.sha256(body.encode("utf-8")).hexdigest()
+
+
+async def claim_idempotency_key(
+    db: AsyncIOMotorDatabase,
+    scope: str,
+    key: str,
+    fingerprint: str
+) -> Optional[JSONResponse]:
+    """
+    Claim a key for this request
+    Returns None if the caller should process the request, or the response to send instead
+    """
+    if len(key) > MAX_IDEMPOTENCY_KEY_LENGTH:
+        raise HTTPException(status_code=400, detail="Idempotency-Key is too long")
+
+    try:
+        await db.idempotency_keys.insert_one({
+            "_id": f"{scope}:{key}",
+            "fingerprint": fingerprint,
+            "status": "processing",
+            "created_at": datetime.utcnow()
+        })
+        return None
+    except DuplicateKeyError:
+        pass
+
+    record = await db.idempotency_keys.find_one({"_id": f"{scope}:{key}"})
+    if record is None:
+        # Released between our insert and read (the first attempt failed); let the client retry
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is being processed")
+
+    if record.get("fingerprint") != fingerprint:
+        raise HTTPException(status_code=422, detail="Idempotency-Key was already used with a different request")
+
+    if record.get("status") != "completed":
+        stale_before = datetime.utcnow() - timedelta(seconds=IDEMPOTENCY_PROCESSING_TIMEOUT_SECONDS)
+        if record["created_at"] < stale_before:
+            # Conditional on the old created_at so only one retry wins the takeover
+            result = await db.idempotency_keys.update_one(
+                {"_id": record["_id"], "status": "processing", "created_at": record["created_at"]},
+                {"$set": {"created_at": datetime.utcnow()}}
+            )
+            if result.modified_count == 1:
+                return None
+        raise HTTPException(status_code=409, detail="A request with this Idempotency-Key is being processed")
+
+    return JSONResponse(
+        content=record["response"],
+        status_code=record.get("status_code", 200),
+        headers={"Idempotent-Replayed": "true"}
+    )
+
+
+async def complete_idempotency_key(
+    db: AsyncIOMotorDatabase,
+    scope: str,
+    key: str,
+    response_body,
+    status_code: int = 200
+) -> None:
+    """Store the response so later requests with the same key replay it"""
+    await db.idempotency_keys.update_one(
+        {"_id": f"{scope}:{key}"},
+        {"$set": {
+            "status": "completed",
+            "status_code": status_code,
+            "response": jsonable_encoder(response_body),
+            "completed_at": datetime.utcnow()
+        }}
+    )
+
+
+async def release_idempotency_key(db: AsyncIOMotorDatabase, scope: str, key: str) -> None:
+    """Forget a claimed key after a failed attempt so the client can retry with it"""
+    await db.idempotency_keys.delete_one({"_id": f"{scope}:{key}", "status": "processing"})
+
+
+async def claim_message(db: AsyncIOMotorDatabase, message_id: str) -> bool:
+    """Record an inbound message id; False if it was already seen (a provider retry)"""
+    try:
+        await db.processed_messages.insert_one({"_id": message_id, "created_at": datetime.utcnow()})
+        return True
+    except DuplicateKeyError:
+        return False
+
+
+async def release_message(db: AsyncIOMotorDatabase, message_id: str) -> None:
+    """Forget a message whose processing failed so the provider's retry is handled"""
+    await db.processed_messages.delete_one({"_id": message_id})
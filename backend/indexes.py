@@ -0,0 +1,114 @@
+"""
+MongoDB index definitions, created once at startup
+"""
+import logging
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+
+from idempotency import IDEMPOTENCY_KEY_TTL_SECONDS, PROCESSED_MESSAGE_TTL_SECONDS
+from phone_utils import normalize_saudi_phone
+
+logger = logging.getLogger(__name__)
+
+# collection -> list of (keys, options)
+INDEXES = {
+    "products": [
+        # Point lookups by public id, including the notify-requests $lookup
+        ([("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+    ],
+    "notify_requests": [
+        # One Notify Me registration per phone and product
+        ([("product_id", ASCENDING), ("phone", ASCENDING)], {"unique": True, "name": "product_phone_unique"}),
+        # Paginated drill-down per product, newest first
+        ([("product_id", ASCENDING), ("created_at", DESCENDING)], {"name": "product_created_at"}),
+    ],
+    "orders": [
+        # Point lookups and the $in batches of the bulk order endpoints
+        ([("id", ASCENDING)], {"unique": True, "name": "id_unique"}),
+        # Pending-order scans: the webhook's legacy match and the expiry sweeper
+        ([("confirmation_status", ASCENDING), ("created_at", ASCENDING)], {"name": "confirmation_status_created_at"}),
+        # Orders cancelled by one expiry sweep, read back to release their stock
+        ([("expiry_sweep_id", ASCENDING)], {"sparse": True, "name": "expiry_sweep_id"}),
+    ],
+    "inventory_movements": [
+        # Per-product history and replay since a snapshot (_id is insertion ordered)
+        ([("product_id", ASCENDING), ("_id", DESCENDING)], {"name": "product_id_id"}),
+    ],
+    "inventory_snapshots": [
+        ([("created_at", DESCENDING)], {"name": "created_at"}),
+    ],
+    "inventory_snapshot_items": [
+        ([("snapshot_id", ASCENDING), ("product_id", ASCENDING)], {"name": "snapshot_product"}),
+    ],
+    "event_stream_tickets": [
+        # Unredeemed admin feed tickets; redeem_stream_ticket also checks expires_at
+        ([("expires_at", ASCENDING)], {"expireAfterSeconds": 0, "name": "expires_at_ttl"}),
+    ],
+    "idempotency_keys": [
+        # Replayable responses expire; the key itself is the _id, which is already unique
+        ([("created_at", ASCENDING)], {"expireAfterSeconds": IDEMPOTENCY_KEY_TTL_SECONDS, "name": "created_at_ttl"}),
+    ],
+    "processed_messages": [
+        ([("created_at", ASCENDING)], {"expireAfterSeconds": PROCESSED_MESSAGE_TTL_SECONDS, "name": "created_at_ttl"}),
+    ],
+}
+
+
+# Indexes the application relies on for correctness: startup fails without them
+REQUIRED_INDEXES = {
+    # Notify Me registration has no other duplicate check
+    ("notify_requests", "product_phone_unique"),
+}
+
+
+async def dedupe_notify_requests(db: AsyncIOMotorDatabase) -> int:
+    """
+    Normalize stored phones and drop duplicate (product_id, phone) registrations,
+    keeping the oldest, so the unique index can be built over existing data
+    Returns the number of rows removed
+    """
+    seen = set()
+    duplicate_ids = []
+    renormalized = 0
+    async for notify_request in db.notify_requests.find({}, {"_id": 1, "product_id": 1, "phone": 1}).sort("created_at", 1):
+        phone = normalize_saudi_phone(notify_request.get("phone") or "")
+        key = (notify_request.get("product_id"), phone)
+        if key in seen:
+            duplicate_ids.append(notify_request["_id"])
+            continue
+        seen.add(key)
+        if phone != notify_request.get("phone"):
+            await db.notify_requests.update_one({"_id": notify_request["_id"]}, {"$set": {"phone": phone}})
+            renormalized += 1
+
+    if duplicate_ids:
+        await db.notify_requests.delete_many({"_id": {"$in": duplicate_ids}})
+    if duplicate_ids or renormalized:
+        logger.info(
+            "Notify requests: normalized %d phone(s), removed %d duplicate(s)",
+            renormalized, len(duplicate_ids)
+        )
+    return len(duplicate_ids)
+
+
+async def ensure_indexes(db: AsyncIOMotorDatabase) -> None:
+    """
+    Create all indexes
+    A failure is logged and startup continues, except for REQUIRED_INDEXES, which raise
+    """
+    if "product_phone_unique" not in await db.notify_requests.index_information():
+        # First build of the unique index: clean up rows written before it existed
+        await dedupe_notify_requests(db)
+
+    for collection_name, indexes in INDEXES.items():
+        collection = db[collection_name]
+        for keys, options in indexes:
+            try:
+                await collection.create_index(keys, **options)
+            except OperationFailure as e:
+                if (collection_name, options.get("name")) in REQUIRED_INDEXES:
+                    raise
+                # e.g. existing duplicates prevent building a unique index
+                logger.warning("Could not create index %s on %s: %s", options.get("name"), collection_name, e)
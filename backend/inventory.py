@@ -0,0 +1,88 @@
+"""
+Stock changes and the inventory ledger
+
+Every change to a product's quantity is also appended to the
+inventory_movements collection (product_id, delta, reason, ref), so drift in
+quantity can be explained and reconciled (see inventory_reconciliation).
+
+Increments go through apply_stock_changes: deltas are summed per product and
+written with one unordered bulk_write, and the matching movements with one
+insert_many right after it. Writes that set quantity outright (admin edits,
+imports) record their movement with record_movements.
+"""
+from collections import defaultdict
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import UpdateOne
+
+# Movement reasons
+ORDER_PLACED = "order_placed"
+ORDER_CANCELLED = "order_cancelled"
+ORDER_EXPIRED = "order_expired"
+ORDER_DELETED = "order_deleted"
+PRODUCT_CREATED = "product_created"
+ADMIN_ADJUSTMENT = "admin_adjustment"
+PRODUCT_IMPORT = "product_import"
+# Written by reconciliation: an unrecorded change found as drift, and its correction
+UNRECORDED_CHANGE = "unrecorded_change"
+RECONCILIATION = "reconciliation"
+
+# (product id, delta, ref such as the order id)
+StockChange = Tuple[str, int, Optional[str]]
+
+
+def movement(product_id: str, delta: int, reason: str, ref: Optional[str] = None, at: Optional[datetime] = None) -> dict:
+    return {
+        "product_id": product_id,
+        "delta": delta,
+        "reason": reason,
+        "ref": ref,
+        "created_at": at or datetime.utcnow(),
+    }
+
+
+async def record_movements(db: AsyncIOMotorDatabase, movements: List[dict]) -> None:
+    movements = [entry for entry in movements if entry["delta"]]
+    if movements:
+        await db.inventory_movements.insert_many(movements, ordered=False)
+
+
+async def apply_stock_changes(db: AsyncIOMotorDatabase, changes: Iterable[StockChange], reason: str) -> Dict[str, int]:
+    """
+    $inc product quantities and append the movements to the ledger
+    Returns the total delta per product id
+    """
+    now = datetime.utcnow()
+    totals: Dict[str, int] = defaultdict(int)
+    movements = []
+    for product_id, delta, ref in changes:
+        totals[product_id] += delta
+        movements.append(movement(product_id, delta, reason, ref, now))
+
+    operations = [
+        UpdateOne({"id": product_id}, {"$inc": {"quantity": delta}})
+        for product_id, delta in totals.items()
+        if delta
+    ]
+    if operations:
+        await db.products.bulk_write(operations, ordered=False)
+        await record_movements(db, movements)
+    return {product_id: delta for product_id, delta in totals.items() if delta}
+
+
+async def restore_stock(db: AsyncIOMotorDatabase, orders: Iterable[dict], reason: str = ORDER_CANCELLED) -> Dict[str, int]:
+    """
+    Put the orders' quantities back on their products
+    Returns the quantity restored per product id
+    """
+    return await apply_stock_changes(
+        db,
+        [
+            (item["product_id"], item["quantity"], order.get("id"))
+            for order in orders
+            for item in order.get("items", [])
+        ],
+        reason
+    )
@@ -0,0 +1,223 @@
+"""
+Inventory reconciliation against the movement ledger
+
+The expected quantity of a product is its balance in the latest snapshot plus
+the deltas of every movement recorded since. Movements are summed by a
+server-side aggregation streamed with a cursor, and products are streamed
+too, so a run holds one number per product rather than the history.
+
+Each run writes a new snapshot of the ledger balances, taken as of a point
+slightly in the past (SNAPSHOT_SETTLE_SECONDS) so movements still being
+written by other instances aren't skipped. Replay cost is then bounded by
+the movements since the previous run, however long the history grows.
+
+The first run, and any product with neither a snapshot balance nor
+movements, takes the current quantity as its opening balance.
+
+Repair modes for drift (the product's quantity differs from the ledger):
+  actual  record the difference as an unrecorded change, accepting the quantity
+  ledger  record it, then move the quantity back to the ledger balance
+"""
+import asyncio
+import logging
+import os
+from datetime import datetime, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from bson import ObjectId
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from inventory import RECONCILIATION, UNRECORDED_CHANGE, apply_stock_changes, movement, record_movements
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the periodic (report-only) run
+INVENTORY_RECONCILE_INTERVAL_SECONDS = float(os.environ.get("INVENTORY_RECONCILE_INTERVAL_SECONDS", "3600"))
+INVENTORY_SNAPSHOTS_KEPT = int(os.environ.get("INVENTORY_SNAPSHOTS_KEPT", "3"))
+SNAPSHOT_SETTLE_SECONDS = 60
+SNAPSHOT_WRITE_BATCH_SIZE = 1000
+
+REPAIR_MODES = ("actual", "ledger")
+
+_reconcile_task: Optional[asyncio.Task] = None
+
+
+async def latest_snapshot(db: AsyncIOMotorDatabase) -> Tuple[Optional[dict], Dict[str, int]]:
+    """The newest complete snapshot header and its balance per product"""
+    header = await db.inventory_snapshots.find_one({}, sort=[("created_at", -1)])
+    if header is None:
+        return None, {}
+    balances = {}
+    async for item in db.inventory_snapshot_items.find({"snapshot_id": header["_id"]}, {"_id": 0}):
+        balances[item["product_id"]] = item["quantity"]
+    return header, balances
+
+
+async def _ledger_deltas(
+    db: AsyncIOMotorDatabase,
+    after: Optional[ObjectId],
+    settle_cutoff: ObjectId,
+    product_ids: Optional[List[str]] = None
+) -> Dict[str, dict]:
+    """Per product: sum of deltas after the snapshot, the part before settle_cutoff, and the count"""
+    match = {}
+    if after is not None:
+        match["_id"] = {"$gt": after}
+    if product_ids is not None:
+        match["product_id"] = {"$in": product_ids}
+    pipeline = [
+        {"$match": match},
+        {"$group": {
+            "_id": "$product_id",
+            "delta": {"$sum": "$delta"},
+            "settled_delta": {"$sum": {"$cond": [{"$lt": ["$_id", settle_cutoff]}, "$delta", 0]}},
+            "movements": {"$sum": 1},
+        }},
+    ]
+    deltas = {}
+    async for row in db.inventory_movements.aggregate(pipeline):
+        deltas[row["_id"]] = row
+    return deltas
+
+
+async def _current_quantities(db: AsyncIOMotorDatabase, product_ids: List[str]) -> Dict[str, int]:
+    quantities = {}
+    async for product in db.products.find({"id": {"$in": product_ids}}, {"_id": 0, "id": 1, "quantity": 1}):
+        quantities[product["id"]] = product.get("quantity", 0)
+    return quantities
+
+
+async def _write_snapshot(db: AsyncIOMotorDatabase, balances: Dict[str, int], cutoff: ObjectId) -> ObjectId:
+    snapshot_id = ObjectId()
+    items = [{"snapshot_id": snapshot_id, "product_id": product_id, "quantity": quantity} for product_id, quantity in balances.items()]
+    for start in range(0, len(items), SNAPSHOT_WRITE_BATCH_SIZE):
+        await db.inventory_snapshot_items.insert_many(items[start:start + SNAPSHOT_WRITE_BATCH_SIZE], ordered=False)
+    # The header goes in last, so a snapshot is only ever read once it is complete
+    await db.inventory_snapshots.insert_one({
+        "_id": snapshot_id,
+        "cutoff": cutoff,
+        "products": len(items),
+        "created_at": datetime.utcnow(),
+    })
+
+    old_headers = await db.inventory_snapshots.find({}, {"_id": 1}).sort("created_at", -1).skip(INVENTORY_SNAPSHOTS_KEPT).to_list(None)
+    old_ids = [header["_id"] for header in old_headers]
+    if old_ids:
+        await db.inventory_snapshots.delete_many({"_id": {"$in": old_ids}})
+        await db.inventory_snapshot_items.delete_many({"snapshot_id": {"$in": old_ids}})
+    return snapshot_id
+
+
+async def reconcile_inventory(db: AsyncIOMotorDatabase, repair: Optional[str] = None) -> dict:
+    """
+    Compare every product's quantity with the ledger and write a new snapshot
+    Returns the drifted products (and what was repaired)
+    """
+    if repair is not None and repair not in REPAIR_MODES:
+        raise ValueError(f"Unknown repair mode: {repair}")
+
+    settle_cutoff = ObjectId.from_datetime(datetime.utcnow() - timedelta(seconds=SNAPSHOT_SETTLE_SECONDS))
+    header, balances = await latest_snapshot(db)
+    after = header["cutoff"] if header else None
+    deltas = await _ledger_deltas(db, after, settle_cutoff)
+
+    checked = 0
+    new_balances: Dict[str, int] = {}
+    expected: Dict[str, int] = {}
+    actual: Dict[str, int] = {}
+    untracked: List[str] = []
+    async for product in db.products.find({}, {"_id": 0, "id": 1, "quantity": 1}):
+        checked += 1
+        product_id = product["id"]
+        quantity = product.get("quantity", 0)
+        row = deltas.get(product_id, {"delta": 0, "settled_delta": 0})
+
+        if header is None or (product_id not in balances and product_id not in deltas):
+            # Opening balance: the quantity as of the settle cutoff
+            if header is not None:
+                untracked.append(product_id)
+            new_balances[product_id] = quantity - (row["delta"] - row["settled_delta"])
+            continue
+
+        new_balances[product_id] = balances.get(product_id, 0) + row["settled_delta"]
+        if balances.get(product_id, 0) + row["delta"] != quantity:
+            expected[product_id] = balances.get(product_id, 0) + row["delta"]
+            actual[product_id] = quantity
+
+    if expected:
+        # An order may have landed between the two reads; keep only drift that survives a re-read
+        product_ids = list(expected)
+        deltas_again = await _ledger_deltas(db, after, settle_cutoff, product_ids)
+        quantities = await _current_quantities(db, product_ids)
+        for product_id in product_ids:
+            ledger = balances.get(product_id, 0) + deltas_again.get(product_id, {"delta": 0})["delta"]
+            if product_id not in quantities or quantities[product_id] == ledger:
+                del expected[product_id]
+                del actual[product_id]
+            else:
+                expected[product_id] = ledger
+                actual[product_id] = quantities[product_id]
+
+    drifted = [
+        {
+            "product_id": product_id,
+            "expected": expected[product_id],
+            "actual": actual[product_id],
+            "drift": actual[product_id] - expected[product_id],
+        }
+        for product_id in expected
+    ]
+
+    if repair and drifted:
+        await record_movements(db, [
+            movement(entry["product_id"], entry["drift"], UNRECORDED_CHANGE)
+            for entry in drifted
+        ])
+        if repair == "ledger":
+            await apply_stock_changes(db, [(entry["product_id"], -entry["drift"], None) for entry in drifted], RECONCILIATION)
+
+    snapshot_id = await _write_snapshot(db, new_balances, settle_cutoff)
+
+    if drifted:
+        logger.warning(
+            "Inventory drift in %d product(s)%s", len(drifted), f", repaired ({repair})" if repair else "",
+            extra={"drifted": [entry["product_id"] for entry in drifted[:20]]}
+        )
+    return {
+        "checked": checked,
+        "replayed_movements": sum(row["movements"] for row in deltas.values()),
+        "drifted": drifted,
+        "untracked": untracked,
+        "repair": repair if drifted else None,
+        "snapshot_id": str(snapshot_id),
+    }
+
+
+def start_inventory_reconciliation(db: AsyncIOMotorDatabase) -> None:
+    """Start the periodic report-only reconciliation (called on application startup)"""
+    global _reconcile_task
+    if INVENTORY_RECONCILE_INTERVAL_SECONDS <= 0:
+        return
+    if _reconcile_task is None or _reconcile_task.done():
+        _reconcile_task = asyncio.create_task(_run_reconciliation(db))
+
+
+async def stop_inventory_reconciliation() -> None:
+    global _reconcile_task
+    if _reconcile_task is None:
+        return
+    _reconcile_task.cancel()
+    try:
+        await _reconcile_task
+    except asyncio.CancelledError:
+        pass
+    _reconcile_task = None
+
+
+async def _run_reconciliation(db: AsyncIOMotorDatabase) -> None:
+    while True:
+        await asyncio.sleep(INVENTORY_RECONCILE_INTERVAL_SECONDS)
+        try:
+            await reconcile_inventory(db)
+        except Exception:
+            logger.exception("Inventory reconciliation failed")
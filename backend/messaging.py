@@ -0,0 +1,86 @@
+"""
+Messaging providers behind a small interface
+
+The Twilio SDK is heavy to import, so it is only loaded the first time a
+message is actually sent. MESSAGING_PROVIDER selects the provider:
+"twilio" (default) or "log", which only writes the message to the log and is
+meant for local development and load tests.
+"""
+import logging
+import os
+import threading
+import uuid
+from typing import NamedTuple, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class SentMessage(NamedTuple):
+    sid: str
+    status: Optional[str] = None
+
+
+class MessagingProvider:
+    """Send a single message; raise on delivery errors"""
+
+    name = "base"
+
+    def send(self, body: str, from_: str, to: str) -> SentMessage:
+        raise NotImplementedError
+
+
+class TwilioProvider(MessagingProvider):
+    name = "twilio"
+
+    def __init__(self, account_sid: str, auth_token: str):
+        self._account_sid = account_sid
+        self._auth_token = auth_token
+        self._client = None
+        self._lock = threading.Lock()
+
+    def _get_client(self):
+        # Sends run in worker threads, so guard the one-time import and construction
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    from twilio.rest import Client
+                    self._client = Client(self._account_sid, self._auth_token)
+        return self._client
+
+    def send(self, body: str, from_: str, to: str) -> SentMessage:
+        message = self._get_client().messages.create(body=body, from_=from_, to=to)
+        return SentMessage(message.sid, message.status)
+
+
+class LogProvider(MessagingProvider):
+    name = "log"
+
+    def send(self, body: str, from_: str, to: str) -> SentMessage:
+        logger.info("Message not sent (log provider)", extra={"to": to, "body_length": len(body)})
+        return SentMessage(f"log-{uuid.uuid4().hex}", "logged")
+
+
+_provider: Optional[MessagingProvider] = None
+
+
+def get_messaging_provider() -> Optional[MessagingProvider]:
+    """Return the configured provider, or None if it is not configured"""
+    global _provider
+    if _provider is not None:
+        return _provider
+
+    provider_name = os.environ.get("MESSAGING_PROVIDER", "twilio")
+    if provider_name == "log":
+        _provider = LogProvider()
+    elif provider_name == "twilio":
+        account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
+        auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
+        if not account_sid or not auth_token:
+            logger.warning("Twilio credentials not configured")
+            return None
+        _provider = TwilioProvider(account_sid, auth_token)
+    else:
+        logger.warning("Unknown MESSAGING_PROVIDER: %s", provider_name)
+        return None
+
+    return _provider
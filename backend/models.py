@@ -3,6 +3,11 @@ from typing import Optional, List
 from datetime import datetime
 import uuid
 
+def write_timestamp() -> datetime:
+    """utcnow truncated to milliseconds, the precision MongoDB stores, so it round-trips exactly (If-Match)"""
+    now = datetime.utcnow()
+    return now.replace(microsecond=now.microsecond // 1000 * 1000)
+
 # Admin Models
 class Admin(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -35,8 +40,14 @@ class Product(BaseModel):
     rating: float = 0.0
     reviews: int = 0
     specs: Optional[dict] = None
-    created_at: datetime = Field(default_factory=datetime.utcnow)
-    updated_at: datetime = Field(default_factory=datetime.utcnow)
+    created_at: datetime = Field(default_factory=write_timestamp)
+    updated_at: datetime = Field(default_factory=write_timestamp)
+
+# Product fields that may be cleared by sending null
+NULLABLE_PRODUCT_FIELDS = frozenset(
+    name for name, field in Product.model_fields.items()
+    if not field.is_required() and field.default is None and field.default_factory is None
+)
 
 class ProductCreate(BaseModel):
     name_en: str
@@ -64,6 +75,17 @@ class ProductUpdate(BaseModel):
     is_visible: Optional[bool] = None
     specs: Optional[dict] = None
 
+    def changes(self) -> dict:
+        """
+        Fields to $set: only those that were sent. null clears the optional
+        fields (original_price, specs) and leaves required ones unchanged, as a
+        blank form field always has. Shared by the admin PUT and product import.
+        """
+        return {
+            name: value for name, value in self.model_dump(exclude_unset=True).items()
+            if value is not None or name in NULLABLE_PRODUCT_FIELDS
+        }
+
 # Notify Me Models
 class NotifyRequest(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -135,6 +157,13 @@ class OrderCreate(BaseModel):
 class OrderStatusUpdate(BaseModel):
     status: str
 
+class OrderBulkStatusUpdate(BaseModel):
+    order_ids: List[str]
+    status: str
+
+class OrderBulkDelete(BaseModel):
+    order_ids: List[str]
+
 # Customer Models
 class Customer(BaseModel):
     id: str = Field(default_factory=lambda: str(uuid.uuid4()))
@@ -157,6 +186,7 @@ class Coupon(BaseModel):
     is_active: bool = True
     usage_count: int = 0
     created_at: datetime = Field(default_factory=datetime.utcnow)
+    updated_at: Optional[datetime] = None  # Set on every admin update; send back as If-Match
 
 class CouponCreate(BaseModel):
     code: str
@@ -0,0 +1,170 @@
+"""
+Expiry of orders the customer never confirmed on WhatsApp
+
+A background sweeper cancels orders still "pending" after
+PENDING_ORDER_EXPIRY_MINUTES and puts their stock back, so unanswered
+confirmation requests don't hold inventory forever. With
+PENDING_ORDER_REMINDER_MINUTES set, a pending order first gets one reminder
+and only expires once the time that reminder announced has passed, counted
+from when it was sent.
+
+Only orders still in status "Pending" qualify: an admin may move an order
+on (Confirmed, Shipped, ...) without the customer ever replying, and such an
+order must not be reminded or cancelled.
+
+Both queries use the (confirmation_status, created_at) index. Each sweep tags
+the orders it cancels with its own id in a single update_many, so an order
+confirmed in the meantime is left alone, and then releases the stock of
+exactly those orders with one bulk_write.
+"""
+import asyncio
+import logging
+import os
+import uuid
+from datetime import datetime, timedelta
+from typing import Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from admin_events import publish_orders_updated
+from inventory import ORDER_EXPIRED, restore_stock
+from whatsapp_service import send_pending_order_reminder
+
+logger = logging.getLogger(__name__)
+
+# 0 disables the sweeper / the reminder
+PENDING_ORDER_EXPIRY_MINUTES = float(os.environ.get("PENDING_ORDER_EXPIRY_MINUTES", str(24 * 60)))
+PENDING_ORDER_REMINDER_MINUTES = float(os.environ.get("PENDING_ORDER_REMINDER_MINUTES", "0"))
+PENDING_ORDER_SWEEP_INTERVAL_SECONDS = float(os.environ.get("PENDING_ORDER_SWEEP_INTERVAL_SECONDS", "300"))
+# Reminders sent per sweep, to stay well inside the messaging rate limit
+PENDING_ORDER_REMINDER_BATCH_SIZE = int(os.environ.get("PENDING_ORDER_REMINDER_BATCH_SIZE", "100"))
+
+_sweeper_task: Optional[asyncio.Task] = None
+
+
+def start_order_expiry_sweeper(db: AsyncIOMotorDatabase) -> None:
+    """Start the periodic sweep (called on application startup)"""
+    global _sweeper_task
+    if PENDING_ORDER_EXPIRY_MINUTES <= 0:
+        logger.info("Pending order expiry disabled")
+        return
+    if _sweeper_task is None or _sweeper_task.done():
+        _sweeper_task = asyncio.create_task(_run_sweeper(db))
+
+
+async def stop_order_expiry_sweeper() -> None:
+    global _sweeper_task
+    if _sweeper_task is None:
+        return
+    _sweeper_task.cancel()
+    try:
+        await _sweeper_task
+    except asyncio.CancelledError:
+        pass
+    _sweeper_task = None
+
+
+async def _run_sweeper(db: AsyncIOMotorDatabase) -> None:
+    while True:
+        try:
+            if PENDING_ORDER_REMINDER_MINUTES > 0:
+                await send_pending_reminders(db)
+            await expire_pending_orders(db)
+        except Exception:
+            logger.exception("Pending order sweep failed")
+        await asyncio.sleep(PENDING_ORDER_SWEEP_INTERVAL_SECONDS)
+
+
+async def send_pending_reminders(db: AsyncIOMotorDatabase) -> int:
+    """
+    Remind customers of orders pending longer than the reminder window, once per order
+    Returns the number of reminders sent
+    """
+    cutoff = datetime.utcnow() - timedelta(minutes=PENDING_ORDER_REMINDER_MINUTES)
+    orders = await db.orders.find(
+        {
+            "confirmation_status": "pending",
+            "status": "Pending",
+            "created_at": {"$lt": cutoff},
+            "reminder_sent_at": {"$exists": False}
+        },
+        {"_id": 0, "id": 1, "public_order_id": 1, "phone": 1}
+    ).limit(PENDING_ORDER_REMINDER_BATCH_SIZE).to_list(None)
+
+    sent = 0
+    for order in orders:
+        # Claim before sending so two instances never remind the same order
+        claimed = await db.orders.update_one(
+            {"id": order["id"], "confirmation_status": "pending", "status": "Pending", "reminder_sent_at": {"$exists": False}},
+            {"$set": {"reminder_sent_at": datetime.utcnow()}}
+        )
+        if claimed.modified_count == 0:
+            continue
+        result = await asyncio.to_thread(
+            send_pending_order_reminder,
+            phone=order["phone"],
+            order_id=order["public_order_id"],
+            expires_in_minutes=reminder_grace_period().total_seconds() / 60
+        )
+        if result.get("success"):
+            sent += 1
+        else:
+            logger.warning("Pending order reminder failed: %s", result.get("error"), extra={"order_id": order["public_order_id"]})
+
+    if sent:
+        logger.info("Sent %d pending order reminder(s)", sent)
+    return sent
+
+
+def reminder_grace_period() -> timedelta:
+    """
+    How long after its reminder an order may be expired: the rest of the expiry
+    window, and never less than one sweep interval
+    """
+    remaining = timedelta(minutes=max(PENDING_ORDER_EXPIRY_MINUTES - PENDING_ORDER_REMINDER_MINUTES, 0))
+    return max(remaining, timedelta(seconds=PENDING_ORDER_SWEEP_INTERVAL_SECONDS))
+
+
+async def expire_pending_orders(db: AsyncIOMotorDatabase) -> int:
+    """
+    Cancel orders pending longer than the expiry window and release their stock
+    Returns the number of orders expired
+    """
+    now = datetime.utcnow()
+    query = {
+        "confirmation_status": "pending",
+        "status": "Pending",
+        "created_at": {"$lt": now - timedelta(minutes=PENDING_ORDER_EXPIRY_MINUTES)},
+    }
+    if PENDING_ORDER_REMINDER_MINUTES > 0:
+        # Never expire an order whose customer hasn't been reminded yet, and give a
+        # reminded customer the time the reminder promised, even when the order was
+        # already overdue when the reminder went out
+        query["reminder_sent_at"] = {"$lt": now - reminder_grace_period()}
+
+    sweep_id = uuid.uuid4().hex
+    result = await db.orders.update_many(
+        query,
+        {"$set": {
+            "confirmation_status": "cancelled",
+            "status": "Cancelled",
+            "cancellation_reason": "expired",
+            "expiry_sweep_id": sweep_id,
+            "updated_at": now
+        }}
+    )
+    if result.modified_count == 0:
+        return 0
+
+    expired = await db.orders.find(
+        {"expiry_sweep_id": sweep_id},
+        {"_id": 0, "id": 1, "items.product_id": 1, "items.quantity": 1}
+    ).to_list(None)
+    restored = await restore_stock(db, expired, ORDER_EXPIRED)
+    publish_orders_updated([order["id"] for order in expired], {"status": "Cancelled", "confirmation_status": "cancelled"})
+
+    logger.info(
+        "Expired %d unconfirmed order(s), released stock for %d product(s)",
+        result.modified_count, len(restored)
+    )
+    return result.modified_count
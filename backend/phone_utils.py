@@ -0,0 +1,66 @@
+"""
+Phone number canonicalization shared by orders, tracking, blocking and the WhatsApp webhook
+"""
+import re
+from functools import lru_cache
+
+_NON_DIGIT_PLUS_RE = re.compile(r'[^\d+]')
+_NON_DIGIT_RE = re.compile(r'\D')
+
+PHONE_CACHE_SIZE = 4096
+
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def normalize_saudi_phone(phone: str) -> str:
+    """
+    Normalize Saudi phone number to international format +966XXXXXXXXX
+    
+    Handles all these formats:
+    - +966506744374 -> +966506744374
+    - 966506744374  -> +966506744374
+    - 0506744374    -> +966506744374
+    - 506744374     -> +966506744374
+    - 00966506744374 -> +966506744374
+    - +966 50 674 4374 -> +966506744374
+    - whatsapp:+966506744374 -> +966506744374
+    """
+    if not phone:
+        return ""
+    
+    # Remove all non-digit characters except + (also drops a whatsapp: prefix)
+    phone = _NON_DIGIT_PLUS_RE.sub('', phone)
+    
+    # Remove leading + and zeros for processing (00966 -> 966)
+    phone = phone.lstrip('+').lstrip('0')
+    
+    # Saudi mobile numbers are 9 digits starting with 5
+    # Full format with country code is 12 digits: 966XXXXXXXXX
+    if phone.startswith('966'):
+        return '+' + phone
+    if len(phone) == 9 and phone.startswith('5'):
+        return '+966' + phone
+    if len(phone) >= 9:
+        # Take the last 9 digits if they look like a Saudi mobile number
+        last_9 = phone[-9:]
+        if last_9.startswith('5'):
+            return '+966' + last_9
+        return '+' + phone
+    return '+966' + phone  # Assume Saudi
+
+
+@lru_cache(maxsize=PHONE_CACHE_SIZE)
+def phone_match_key(phone: str) -> str:
+    """
+    Key used to match the same customer across phone formats
+    Returns the last 9 digits of the normalized number
+    """
+    digits = _NON_DIGIT_RE.sub('', normalize_saudi_phone(phone))
+    return digits[-9:]
+
+
+def phone_variants(phone: str) -> list:
+    """The phone as entered plus its normalized form, for matching legacy documents"""
+    normalized = normalize_saudi_phone(phone)
+    if not phone or phone == normalized:
+        return [normalized]
+    return [phone, normalized]
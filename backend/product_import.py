@@ -0,0 +1,301 @@
+"""
+Bulk product import from CSV or NDJSON
+
+Rows are read from the upload as a stream, in a worker thread so a large
+file never blocks the event loop, and handled in chunks: each chunk
+is validated row by row (ProductCreate for new products, ProductUpdate for
+rows whose id already exists, so updates may be partial), then written with
+one unordered bulk_write of upserts. Lines that can't be decoded or parsed,
+invalid rows, repeated ids and rows the database rejects are reported with
+the line they start on; the rest of the file still goes in. Caches are
+refreshed once at the end.
+
+Stock changes go to the inventory ledger as the difference from the quantity
+each write actually replaced: the write stores the previous quantity on the
+product under a per-chunk tag (an update pipeline, so it is the same atomic
+write), which is read back and removed afterwards. Orders placed while the
+file is imported therefore never skew the recorded deltas.
+
+CSV columns are the ProductCreate field names plus an optional id. Empty
+cells are left out, images are separated by "|", and specs are given either
+as a JSON object in a "specs" column or as one "spec.<key>" column per key.
+In NDJSON updates, null clears original_price or specs and is ignored for
+required fields, exactly as in the admin product PUT.
+"""
+import asyncio
+import codecs
+import csv
+import json
+import logging
+import os
+import uuid
+from itertools import islice
+from typing import IO, Dict, Iterator, List, Optional, Tuple
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pydantic import ValidationError
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+
+from catalog_cache import product_catalog
+from inventory import PRODUCT_IMPORT, movement, record_movements
+from models import Product, ProductCreate, ProductUpdate, write_timestamp
+from restock_notifier import schedule_restock_notifications
+
+logger = logging.getLogger(__name__)
+
+PRODUCT_IMPORT_CHUNK_SIZE = int(os.environ.get("PRODUCT_IMPORT_CHUNK_SIZE", "500"))
+# Row errors listed in the report; the total is always counted
+MAX_REPORTED_ERRORS = 500
+IMAGE_SEPARATOR = "|"
+SPEC_COLUMN_PREFIX = "spec."
+
+# (line the row starts on, parsed record or None, parse error or None)
+Row = Tuple[int, Optional[dict], Optional[str]]
+
+
+def detect_format(filename: Optional[str], content_type: Optional[str]) -> Optional[str]:
+    name = (filename or "").lower()
+    content_type = (content_type or "").split(";", 1)[0].strip().lower()
+    if name.endswith(".csv") or content_type == "text/csv":
+        return "csv"
+    if name.endswith((".ndjson", ".jsonl")) or content_type in ("application/x-ndjson", "application/jsonl"):
+        return "ndjson"
+    return None
+
+
+def _csv_record(record: Dict[str, str]) -> dict:
+    fields = {}
+    specs = {}
+    for column, value in record.items():
+        if column is None or value is None:
+            continue
+        column = column.strip()
+        value = value.strip()
+        if not value:
+            continue
+        if column.startswith(SPEC_COLUMN_PREFIX):
+            specs[column[len(SPEC_COLUMN_PREFIX):]] = value
+        elif column == "images":
+            fields["images"] = [image.strip() for image in value.split(IMAGE_SEPARATOR) if image.strip()]
+        elif column == "specs":
+            fields["specs"] = json.loads(value)
+        else:
+            fields[column] = value
+    if specs:
+        fields["specs"] = {**(fields.get("specs") or {}), **specs}
+    return fields
+
+
+def _decoded_lines(stream: IO[bytes], bad_lines: List[int]) -> Iterator[str]:
+    """
+    Decode the upload line by line, so one bad line doesn't end the import
+    Lines that aren't UTF-8 are decoded with replacement characters and their numbers added to bad_lines
+    """
+    for line_number, line in enumerate(stream, start=1):
+        if line_number == 1 and line.startswith(codecs.BOM_UTF8):
+            # Spreadsheet exports put a BOM in front of the header
+            line = line[len(codecs.BOM_UTF8):]
+        try:
+            yield line.decode("utf-8")
+        except UnicodeDecodeError:
+            bad_lines.append(line_number)
+            yield line.decode("utf-8", errors="replace")
+
+
+def read_csv_rows(stream: IO[bytes]) -> Iterator[Row]:
+    bad_lines: List[int] = []
+    reader = csv.reader(_decoded_lines(stream, bad_lines))
+    try:
+        header = next(reader)
+    except StopIteration:
+        return
+    except csv.Error as e:
+        yield 1, None, f"Invalid CSV header: {e}"
+        return
+    while True:
+        # A quoted cell may span lines; a record starts on the line after the previous one ended
+        start_line = reader.line_num + 1
+        try:
+            values = next(reader)
+        except StopIteration:
+            return
+        except csv.Error as e:
+            yield start_line, None, f"Invalid CSV: {e}"
+            continue
+        if not values:
+            continue
+        if bad_lines and bad_lines[-1] >= start_line:
+            yield start_line, None, "Invalid UTF-8"
+            continue
+        try:
+            yield start_line, _csv_record(dict(zip(header, values))), None
+        except (ValueError, TypeError) as e:
+            yield start_line, None, f"specs: {e}"
+
+
+def read_ndjson_rows(stream: IO[bytes]) -> Iterator[Row]:
+    bad_lines: List[int] = []
+    for line_number, line in enumerate(_decoded_lines(stream, bad_lines), start=1):
+        if bad_lines and bad_lines[-1] == line_number:
+            yield line_number, None, "Invalid UTF-8"
+            continue
+        if not line.strip():
+            continue
+        try:
+            record = json.loads(line)
+        except ValueError as e:
+            yield line_number, None, f"Invalid JSON: {e}"
+            continue
+        if not isinstance(record, dict):
+            yield line_number, None, "Expected a JSON object"
+            continue
+        yield line_number, record, None
+
+
+def _validation_messages(error: ValidationError) -> List[str]:
+    return [
+        f"{'.'.join(str(part) for part in detail['loc']) or 'row'}: {detail['msg']}"
+        for detail in error.errors()
+    ]
+
+
+class ImportReport:
+    def __init__(self):
+        self.processed = 0
+        self.valid = 0
+        self.inserted = 0
+        self.updated = 0
+        self.failed = 0
+        self.errors: List[dict] = []
+        # Product id -> line of the row that wrote it; a later row with the same id is rejected
+        self.seen_ids: Dict[str, int] = {}
+
+    def add_error(self, row_number: int, product_id: Optional[str], messages: List[str]) -> None:
+        self.failed += 1
+        if len(self.errors) < MAX_REPORTED_ERRORS:
+            self.errors.append({"row": row_number, "id": product_id, "errors": messages})
+
+    def as_dict(self) -> dict:
+        return {
+            "processed": self.processed,
+            "valid": self.valid,
+            "inserted": self.inserted,
+            "updated": self.updated,
+            "failed": self.failed,
+            "errors": self.errors,
+        }
+
+
+def _set_stage(fields: dict) -> dict:
+    """Update pipeline $set of plain values ($literal, so strings such as "$5 off" stay text)"""
+    return {name: {"$literal": value} for name, value in fields.items()}
+
+
+async def _import_chunk(db: AsyncIOMotorDatabase, chunk: List[Row], report: ImportReport, dry_run: bool) -> None:
+    report.processed += len(chunk)
+
+    ids = [record["id"] for _, record, _ in chunk if record and isinstance(record.get("id"), str)]
+    existing = set()
+    if ids:
+        async for product in db.products.find({"id": {"$in": ids}}, {"_id": 0, "id": 1}):
+            existing.add(product["id"])
+
+    now = write_timestamp()
+    batch_id = uuid.uuid4().hex
+    # Stored by each write: the quantity it replaces, read back below for the ledger
+    tag = {"import_batch": {"id": batch_id, "previous_quantity": "$quantity"}}
+    operations = []
+    # Per operation: row number, id and the quantity it sets (None if unchanged)
+    operation_rows: List[Tuple[int, str, Optional[int]]] = []
+    for row_number, record, parse_error in chunk:
+        if parse_error:
+            report.add_error(row_number, None, [parse_error])
+            continue
+
+        product_id = record.pop("id", None)
+        if product_id in report.seen_ids:
+            report.add_error(row_number, product_id, [f"Duplicate id, first given in row {report.seen_ids[product_id]}"])
+            continue
+        try:
+            if product_id in existing:
+                # Partial update with the same null handling as update_product (ProductUpdate.changes)
+                fields = ProductUpdate(**record).changes()
+                stage = {**_set_stage({**fields, "updated_at": now}), **tag}
+            else:
+                product = Product(**ProductCreate(**record).model_dump(), **({"id": product_id} if product_id else {}))
+                fields = product.model_dump()
+                created_at = fields.pop("created_at")
+                stage = {
+                    **_set_stage(fields),
+                    "created_at": {"$ifNull": ["$created_at", {"$literal": created_at}]},
+                    **tag,
+                }
+                product_id = product.id
+        except ValidationError as e:
+            report.add_error(row_number, product_id, _validation_messages(e))
+            continue
+
+        report.seen_ids[product_id] = row_number
+        operations.append(UpdateOne({"id": product_id}, [{"$set": stage}], upsert=True))
+        operation_rows.append((row_number, product_id, fields.get("quantity")))
+
+    report.valid += len(operations)
+    if not operations or dry_run:
+        return
+
+    failed_indexes = set()
+    try:
+        result = await db.products.bulk_write(operations, ordered=False)
+        details = result.bulk_api_result
+    except BulkWriteError as e:
+        details = e.details
+        for write_error in details.get("writeErrors", []):
+            index = write_error["index"]
+            failed_indexes.add(index)
+            row_number, product_id, _ = operation_rows[index]
+            report.add_error(row_number, product_id, [write_error.get("errmsg", "Write failed")])
+
+    report.inserted += details.get("nUpserted", 0)
+    report.updated += details.get("nMatched", 0)
+
+    written = [row for index, row in enumerate(operation_rows) if index not in failed_indexes]
+    written_ids = [product_id for _, product_id, _ in written]
+    tagged = {"id": {"$in": written_ids}, "import_batch.id": batch_id}
+    previous_quantities = {}
+    async for product in db.products.find(tagged, {"_id": 0, "id": 1, "import_batch": 1}):
+        previous_quantities[product["id"]] = product["import_batch"].get("previous_quantity")
+    await db.products.update_many(tagged, {"$unset": {"import_batch": ""}})
+
+    movements = []
+    for _, product_id, quantity in written:
+        if quantity is None:
+            continue
+        previous_quantity = previous_quantities.get(product_id)
+        movements.append(movement(product_id, quantity - (previous_quantity or 0), PRODUCT_IMPORT))
+        # Back in stock: fan out Notify Me messages, as a single product update would
+        if previous_quantity is not None and previous_quantity <= 0 < quantity:
+            schedule_restock_notifications(db, {"id": product_id})
+    await record_movements(db, movements)
+
+
+async def import_products(db: AsyncIOMotorDatabase, rows: Iterator[Row], dry_run: bool = False) -> dict:
+    """Validate and upsert every row; returns counts and per-row errors"""
+    report = ImportReport()
+    while True:
+        # Readers report undecodable or malformed lines as row errors and keep going. They
+        # read the upload's spooled file with blocking I/O, so pull each chunk in a thread
+        chunk = await asyncio.to_thread(lambda: list(islice(rows, PRODUCT_IMPORT_CHUNK_SIZE)))
+        if not chunk:
+            break
+        await _import_chunk(db, chunk, report, dry_run)
+
+    if not dry_run and (report.inserted or report.updated):
+        # One refresh for the whole file; search and facet indexes follow the catalog
+        await product_catalog.reload(db)
+
+    logger.info(
+        "Product import%s: %d row(s), %d inserted, %d updated, %d failed",
+        " (dry run)" if dry_run else "", report.processed, report.inserted, report.updated, report.failed
+    )
+    return report.as_dict()
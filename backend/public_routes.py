@@ -1,9 +1,12 @@
-from fastapi import APIRouter, HTTPException, Depends, Form, Request
+from fastapi import APIRouter, HTTPException, Depends, Form, Header, Query, Request
 from fastapi.responses import FileResponse, Response
 from typing import List, Optional
 from datetime import datetime
+import asyncio
+import logging
 from motor.motor_asyncio import AsyncIOMotorDatabase
 from pathlib import Path
+from pymongo.errors import DuplicateKeyError
 from models import (
     Product, NotifyRequestCreate, NotifyRequest,
     Order, OrderCreate, CouponValidate, CouponValidateResponse,
@@ -16,13 +19,29 @@ from whatsapp_service import (
     parse_confirmation_reply,
     format_phone_for_whatsapp
 )
+from catalog_cache import product_catalog, coupon_cache
+from search_index import product_search_index
+from facet_index import product_facet_index, parse_facet_filters
+from background import spawn
+from inventory import ORDER_PLACED, apply_stock_changes, restore_stock
+from admin_events import publish_low_stock, publish_order_created, publish_orders_updated
+from idempotency import (
+    claim_idempotency_key,
+    complete_idempotency_key,
+    release_idempotency_key,
+    request_fingerprint,
+    claim_message,
+    release_message
+)
+from phone_utils import normalize_saudi_phone, phone_match_key, phone_variants
+from metrics import span
+from database import get_db, get_catalog_db
+from serialization import dumps, shape_documents, trusted_response
+from compression import encoded_response
 
 public_router = APIRouter(tags=["Public"])
 
-# Dependency to get database
-def get_db():
-    from server import db
-    return db
+logger = logging.getLogger(__name__)
 
 # Status translations for Arabic
 STATUS_TRANSLATIONS = {
@@ -61,13 +80,61 @@ async def serve_product_image(filename: str):
 # ==================== PRODUCTS ====================
 
 @public_router.get("/products", response_model=List[Product])
-async def get_products(db: AsyncIOMotorDatabase = Depends(get_db)):
-    """Get all visible products with stock status"""
-    products = await db.products.find({"is_visible": True}, {"_id": 0}).to_list(1000)
-    return products
+async def get_products(request: Request, db: AsyncIOMotorDatabase = Depends(get_catalog_db)):
+    """
+    Get all visible products with stock status
+    Optional facet filters: category, price, in_stock and spec.<key> (repeat a parameter to OR values)
+    """
+    filters = parse_facet_filters(request.query_params.multi_items())
+    if filters:
+        catalog = await product_catalog.get_all(db)
+        matched = product_facet_index.matching_ids(filters)
+        return trusted_response(Product, (product for product_id, product in catalog.items() if product_id in matched))
+
+    # The full listing is encoded (and compressed) once per catalog snapshot
+    catalog = await product_catalog.get_all(db)
+    encoded = product_catalog.encoded_bodies.get(
+        "visible",
+        lambda: dumps(shape_documents(Product, (product for product in catalog.values() if product.get("is_visible"))))
+    )
+    return encoded_response(request, encoded)
+
+@public_router.get("/products/facets")
+async def get_product_facets(request: Request, db: AsyncIOMotorDatabase = Depends(get_catalog_db)):
+    """Facet counts for the filter sidebar, under the same filters as /products"""
+    # Loading the catalog also (re)builds the facet index
+    await product_catalog.get_all(db)
+    filters = parse_facet_filters(request.query_params.multi_items())
+    return {
+        "total": len(product_facet_index.matching_ids(filters)),
+        "facets": product_facet_index.counts(filters)
+    }
+
+@public_router.get("/products/search", response_model=List[Product])
+async def search_products(
+    q: str = Query(..., min_length=1, max_length=100),
+    category: Optional[str] = None,
+    limit: int = Query(20, ge=1, le=100),
+    db: AsyncIOMotorDatabase = Depends(get_catalog_db)
+):
+    """Search visible products by English or Arabic name and description, best match first"""
+    # Loading the catalog also (re)builds the search index
+    products = await product_catalog.get_all(db)
+
+    results = []
+    for product_id, _score in product_search_index.search(q):
+        product = products.get(product_id)
+        if not product or not product.get("is_visible", True):
+            continue
+        if category and product.get("category") != category:
+            continue
+        results.append(product)
+        if len(results) >= limit:
+            break
+    return results
 
 @public_router.get("/products/{product_id}", response_model=Product)
-async def get_product(product_id: str, db: AsyncIOMotorDatabase = Depends(get_db)):
+async def get_product(product_id: str, db: AsyncIOMotorDatabase = Depends(get_catalog_db)):
     """Get a specific product"""
     product = await db.products.find_one({"id": product_id, "is_visible": True}, {"_id": 0})
     if not product:
@@ -82,26 +149,24 @@ async def create_notify_request(
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
     """Create a notify me request for out of stock product"""
-    # Verify product exists and is out of stock
-    product = await db.products.find_one({"id": request_data.product_id}, {"_id": 0})
+    # Verify product exists and is out of stock (served from the catalog cache)
+    product = await product_catalog.get(db, request_data.product_id)
     if not product:
         raise HTTPException(status_code=404, detail="Product not found")
     
     if product.get("quantity", 0) > 0:
         raise HTTPException(status_code=400, detail="Product is in stock")
     
-    # Check if request already exists
-    existing = await db.notify_requests.find_one({
-        "product_id": request_data.product_id,
-        "phone": request_data.phone
-    })
-    
-    if existing:
+    # The unique (product_id, phone) index rejects duplicates, even concurrent ones;
+    # the phone is normalized so every format of the same number hits the same key
+    notify_dict = request_data.model_dump()
+    notify_dict["phone"] = normalize_saudi_phone(request_data.phone)
+    notify_request = NotifyRequest(**notify_dict)
+    try:
+        await db.notify_requests.insert_one(notify_request.model_dump())
+    except DuplicateKeyError:
         raise HTTPException(status_code=400, detail="You have already requested notification for this product")
     
-    notify_request = NotifyRequest(**request_data.model_dump())
-    await db.notify_requests.insert_one(notify_request.model_dump())
-    
     return notify_request
 
 # ==================== ORDERS ====================
@@ -109,78 +174,118 @@ async def create_notify_request(
 @public_router.post("/orders", response_model=Order)
 async def create_order(
     order_data: OrderCreate,
+    idempotency_key: Optional[str] = Header(None, alias="Idempotency-Key"),
     db: AsyncIOMotorDatabase = Depends(get_db)
 ):
-    """Create a new order"""
-    # Check if customer is blocked
-    blocked = await db.blocked_customers.find_one({"phone": order_data.phone})
+    """
+    Create a new order
+    With an Idempotency-Key header, retries replay the first response instead of
+    creating another order
+    """
+    if not idempotency_key:
+        return await _create_order(order_data, db)
+    
+    replay = await claim_idempotency_key(
+        db, "orders", idempotency_key, request_fingerprint(order_data.model_dump_json())
+    )
+    if replay is not None:
+        return replay
+    
+    try:
+        return await _create_order(order_data, db, idempotency_key)
+    except HTTPException:
+        # Rejected before the order was written (blocked customer, out of stock): nothing to
+        # replay, so free the key for a retry. Once the order is written the key is completed
+        # and this is a no-op; any other failure leaves the key claimed rather than risk a
+        # second order
+        await release_idempotency_key(db, "orders", idempotency_key)
+        raise
+
+async def _create_order(
+    order_data: OrderCreate,
+    db: AsyncIOMotorDatabase,
+    idempotency_key: Optional[str] = None
+) -> Order:
+    # Check if customer is blocked (blocks may be stored in either form)
+    with span("create_order.blocked_check"):
+        blocked = await db.blocked_customers.find_one({"phone": {"$in": phone_variants(order_data.phone)}})
     if blocked:
         raise HTTPException(status_code=403, detail="Your account has been blocked. Please contact support.")
     
     # Verify products are in stock
-    for item in order_data.items:
-        product = await db.products.find_one({"id": item.product_id}, {"_id": 0})
-        if not product:
-            raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
+    with span("create_order.stock_check"):
+        for item in order_data.items:
+            product = await db.products.find_one({"id": item.product_id}, {"_id": 0})
+            if not product:
+                raise HTTPException(status_code=404, detail=f"Product {item.product_id} not found")
         
-        if product.get("quantity", 0) < item.quantity:
-            raise HTTPException(
-                status_code=400,
-                detail=f"Insufficient stock for {product.get('name_en', 'product')}"
-            )
+            if product.get("quantity", 0) < item.quantity:
+                raise HTTPException(
+                    status_code=400,
+                    detail=f"Insufficient stock for {product.get('name_en', 'product')}"
+                )
     
     # Generate public order ID
-    public_order_id = await generate_public_order_id(db)
+    with span("create_order.order_id"):
+        public_order_id = await generate_public_order_id(db)
     
     # Create order with public ID and pending confirmation status
     order_dict = order_data.model_dump()
     order_dict["public_order_id"] = public_order_id
+    order_dict["phone"] = normalize_saudi_phone(order_data.phone)
     order_dict["confirmation_status"] = "pending"  # WhatsApp confirmation pending
     order = Order(**order_dict)
-    await db.orders.insert_one(order.model_dump())
+    with span("create_order.insert"):
+        await db.orders.insert_one(order.model_dump())
+    if idempotency_key:
+        # The order exists from here on: a retry must replay it even if a later step fails
+        await complete_idempotency_key(db, "orders", idempotency_key, order)
     
     # Reduce product quantities
-    for item in order_data.items:
-        await db.products.update_one(
-            {"id": item.product_id},
-            {"$inc": {"quantity": -item.quantity}}
+    with span("create_order.stock_update"):
+        await apply_stock_changes(
+            db,
+            [(item.product_id, -item.quantity, order.id) for item in order_data.items],
+            ORDER_PLACED
         )
+    publish_order_created(order.model_dump())
+    await publish_low_stock(db, [item.product_id for item in order_data.items])
+    
+    # Send WhatsApp confirmation request in the background (don't block order creation)
+    spawn(_send_order_confirmation(order), name=f"whatsapp-confirmation-{public_order_id}")
     
-    # Send WhatsApp confirmation request (async, don't block order creation)
+    return order
+
+async def _send_order_confirmation(order: Order) -> None:
+    """Send the WhatsApp confirmation request off the event loop"""
     try:
-        whatsapp_result = send_order_confirmation_request(
-            phone=order.phone,
-            order_id=public_order_id,
-            customer_name=order.customer_name,
-            total=order.total,
-            language='en'  # Default to English, can be enhanced to detect language
-        )
+        with span("whatsapp.order_confirmation"):
+            whatsapp_result = await asyncio.to_thread(
+                send_order_confirmation_request,
+                phone=order.phone,
+                order_id=order.public_order_id,
+                customer_name=order.customer_name,
+                total=order.total,
+                language='en'  # Default to English, can be enhanced to detect language
+            )
         if whatsapp_result.get("success"):
-            print(f"WhatsApp confirmation sent for order {public_order_id}")
+            logger.info("WhatsApp confirmation sent", extra={"order_id": order.public_order_id})
         else:
-            print(f"WhatsApp send failed for order {public_order_id}: {whatsapp_result.get('error')}")
-    except Exception as e:
+            logger.warning("WhatsApp send failed: %s", whatsapp_result.get("error"), extra={"order_id": order.public_order_id})
+    except Exception:
         # Don't fail order creation if WhatsApp fails
-        print(f"WhatsApp error for order {public_order_id}: {str(e)}")
-    
-    return order
+        logger.exception("WhatsApp error", extra={"order_id": order.public_order_id})
 
-# ==================== WHATSAPP WEBHOOK ====================
+async def _send_in_background(send_function, *args, **kwargs) -> None:
+    """Run a blocking whatsapp_service send in a worker thread and log failures"""
+    try:
+        result = await asyncio.to_thread(send_function, *args, **kwargs)
+        if not result.get("success"):
+            logger.warning("%s failed: %s", send_function.__name__, result.get("error"))
+    except Exception:
+        logger.exception("%s failed", send_function.__name__)
 
-def normalize_phone_for_matching(phone: str) -> str:
-    """
-    Normalize phone number for database matching
-    Returns the last 9 digits (Saudi mobile numbers start with 5)
-    """
-    import re
-    # Remove whatsapp: prefix if present
-    phone = phone.replace("whatsapp:", "").strip()
-    # Extract only digits
-    digits = re.sub(r'\D', '', phone)
-    # Return last 9 digits for Saudi numbers
-    if len(digits) >= 9:
-        return digits[-9:]
-    return digits
+# ==================== WHATSAPP WEBHOOK ====================
 
 @public_router.post("/whatsapp/webhook")
 async def whatsapp_webhook(
@@ -190,112 +295,125 @@ async def whatsapp_webhook(
     """
     Handle incoming WhatsApp messages from Twilio webhook
     Twilio sends form data with message details
+    
+    Twilio retries on timeouts, so each MessageSid is processed at most once and
+    the order only moves out of "pending" once; repeats are no-ops.
     """
+    message_sid = None
     try:
         form_data = await request.form()
         
         # Extract message details from Twilio webhook
         from_number = form_data.get("From", "")  # Format: whatsapp:+966501234567
         message_body = form_data.get("Body", "")
+        message_sid = form_data.get("MessageSid")
+        
+        if message_sid and not await claim_message(db, message_sid):
+            logger.info("Duplicate webhook delivery ignored", extra={"message_sid": message_sid})
+            return Response(content="", status_code=200)
         
         # Clean the phone number (remove 'whatsapp:' prefix)
         phone = from_number.replace("whatsapp:", "").strip()
-        phone_last_9 = normalize_phone_for_matching(phone)
+        phone_last_9 = phone_match_key(phone)
         
-        print(f"Received WhatsApp from {phone}: {message_body}")
-        print(f"Normalized phone (last 9 digits): {phone_last_9}")
+        logger.info("Received WhatsApp message", extra={"phone_key": phone_last_9, "body_length": len(message_body)})
         
         if not phone or not message_body:
             return Response(content="", status_code=200)
         
         # Parse the reply
-        confirmation_status = parse_confirmation_reply(message_body)
+        with span("whatsapp_webhook.parse"):
+            confirmation_status = parse_confirmation_reply(message_body)
         
         # Find the most recent pending order for this phone number
-        # Match by last 9 digits to handle all phone formats
-        order = None
-        
-        # Get all pending orders and match by last 9 digits
-        pending_orders = await db.orders.find(
-            {"confirmation_status": "pending"},
-            {"_id": 0}
-        ).sort("created_at", -1).to_list(100)
+        with span("whatsapp_webhook.find_order"):
+            # New orders store the normalized phone, so try an exact match first
+            order = await db.orders.find_one(
+                {"confirmation_status": "pending", "phone": normalize_saudi_phone(phone)},
+                {"_id": 0},
+                sort=[("created_at", -1)]
+            )
         
-        for pending_order in pending_orders:
-            order_phone = pending_order.get("phone", "")
-            order_last_9 = normalize_phone_for_matching(order_phone)
-            if order_last_9 == phone_last_9:
-                order = pending_order
-                print(f"Matched order {pending_order.get('public_order_id')} with phone {order_phone} (last 9: {order_last_9})")
-                break
+            if not order:
+                # Older orders kept the phone as typed: match by last 9 digits
+                pending_orders = await db.orders.find(
+                    {"confirmation_status": "pending"},
+                    {"_id": 0}
+                ).sort("created_at", -1).to_list(100)
+            
+                for pending_order in pending_orders:
+                    order_phone = pending_order.get("phone", "")
+                    order_last_9 = phone_match_key(order_phone)
+                    if order_last_9 == phone_last_9:
+                        order = pending_order
+                        logger.debug("Matched legacy pending order by last 9 digits", extra={"order_id": pending_order.get("public_order_id")})
+                        break
         
         if not order:
-            print(f"No pending order found for phone: {phone}")
+            logger.info("No pending order found", extra={"phone_key": phone_last_9})
             # Send guidance message for unknown sender
-            try:
-                from whatsapp_service import send_guidance_message
-                send_guidance_message(phone)
-            except Exception as e:
-                print(f"Failed to send guidance message: {e}")
+            spawn(_send_in_background(send_guidance_message, phone))
             return Response(content="", status_code=200)
         
         # If we couldn't parse the reply, send guidance
         if not confirmation_status:
-            print(f"Could not parse reply from {phone}: {message_body}")
-            try:
-                from whatsapp_service import send_guidance_message
-                send_guidance_message(phone, order.get("public_order_id"))
-            except Exception as e:
-                print(f"Failed to send guidance message: {e}")
+            logger.info("Could not parse reply", extra={"order_id": order.get("public_order_id")})
+            spawn(_send_in_background(send_guidance_message, phone, order.get("public_order_id")))
             return Response(content="", status_code=200)
         
         # Update order confirmation status
         new_status = confirmation_status
         order_status = "Confirmed" if confirmation_status == "confirmed" else "Cancelled"
         
-        await db.orders.update_one(
-            {"id": order["id"]},
-            {
-                "$set": {
-                    "confirmation_status": new_status,
-                    "status": order_status,
-                    "updated_at": datetime.utcnow()
+        with span("whatsapp_webhook.update_order"):
+            # Conditional on "pending" so a concurrent or repeated reply can't apply twice
+            result = await db.orders.update_one(
+                {"id": order["id"], "confirmation_status": "pending"},
+                {
+                    "$set": {
+                        "confirmation_status": new_status,
+                        "status": order_status,
+                        "updated_at": datetime.utcnow()
+                    }
                 }
-            }
-        )
+            )
         
-        print(f"Order {order['public_order_id']} updated to {new_status}")
+        if result.modified_count == 0:
+            logger.info("Order already left pending, ignoring reply", extra={"order_id": order["public_order_id"]})
+            return Response(content="", status_code=200)
+        
+        logger.info("Order confirmation status updated to %s", new_status, extra={"order_id": order["public_order_id"]})
+        publish_orders_updated(
+            [order["id"]],
+            {"status": order_status, "confirmation_status": new_status},
+            order["public_order_id"]
+        )
         
         # If cancelled, restore product quantities
         if confirmation_status == "cancelled":
-            for item in order.get("items", []):
-                await db.products.update_one(
-                    {"id": item["product_id"]},
-                    {"$inc": {"quantity": item["quantity"]}}
-                )
-            print(f"Stock restored for cancelled order {order['public_order_id']}")
+            with span("whatsapp_webhook.restore_stock"):
+                await restore_stock(db, [order])
+            logger.info("Stock restored for cancelled order", extra={"order_id": order["public_order_id"]})
         
-        # Send confirmation/cancellation message to customer via Twilio API
-        try:
-            result = send_confirmation_status_message(
-                phone=phone,
-                order_id=order["public_order_id"],
-                status=new_status
-            )
-            if result.get("success"):
-                print(f"Auto-reply sent successfully for order {order['public_order_id']}")
-            else:
-                print(f"Failed to send auto-reply: {result.get('error')}")
-        except Exception as e:
-            print(f"Failed to send confirmation message: {str(e)}")
+        # Send confirmation/cancellation message to customer via Twilio API in the background
+        spawn(_send_in_background(
+            send_confirmation_status_message,
+            phone=phone,
+            order_id=order["public_order_id"],
+            status=new_status
+        ))
         
         # Return empty response (Twilio expects 200 OK)
         return Response(content="", status_code=200)
         
-    except Exception as e:
-        print(f"Webhook error: {str(e)}")
-        import traceback
-        traceback.print_exc()
+    except Exception:
+        logger.exception("Webhook error")
+        # Let Twilio's retry of this message be processed
+        if message_sid:
+            try:
+                await release_message(db, message_sid)
+            except Exception:
+                logger.exception("Failed to release webhook message", extra={"message_sid": message_sid})
         return Response(content="", status_code=200)
 
 # ==================== ORDER TRACKING ====================
@@ -303,14 +421,14 @@ async def whatsapp_webhook(
 @public_router.post("/orders/track", response_model=OrderTrackResponse)
 async def track_order(
     track_data: OrderTrackRequest,
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    db: AsyncIOMotorDatabase = Depends(get_catalog_db)
 ):
     """Track an order by public order ID and phone number"""
     # Find order by public_order_id and phone
     order = await db.orders.find_one(
         {
             "public_order_id": track_data.order_id.upper(),
-            "phone": track_data.phone
+            "phone": {"$in": phone_variants(track_data.phone)}
         },
         {"_id": 0}
     )
@@ -392,16 +510,14 @@ async def validate_coupon(
 
 @public_router.get("/coupons/active")
 async def get_active_coupons(
-    db: AsyncIOMotorDatabase = Depends(get_db)
+    request: Request,
+    db: AsyncIOMotorDatabase = Depends(get_catalog_db)
 ):
     """Get all active and non-expired coupons for public display"""
     current_time = datetime.utcnow()
     
-    # Find all active coupons
-    coupons = await db.coupons.find(
-        {"is_active": True},
-        {"_id": 0}
-    ).to_list(100)
+    # Active coupons come from the in-process cache
+    coupons = await coupon_cache.get_all(db)
     
     # Filter out expired coupons
     active_coupons = []
@@ -422,4 +538,7 @@ async def get_active_coupons(
             "expiry_date": coupon.get("expiry_date").isoformat() if coupon.get("expiry_date") else None
         })
     
-    return active_coupons
+    # Within one snapshot coupons only ever drop out by expiring, so the count
+    # identifies the list and its encoded body can be reused
+    encoded = coupon_cache.encoded_bodies.get(("active", len(active_coupons)), lambda: dumps(active_coupons))
+    return encoded_response(request, encoded)
@@ -0,0 +1,146 @@
+"""
+Slow MongoDB operation detector
+
+A pymongo CommandListener flags commands slower than SLOW_QUERY_THRESHOLD_MS
+and keeps the most recent ones in memory. For a sample of flagged reads and
+writes it runs explain (queryPlanner verbosity) in the background and records
+the winning plan, the indexes used and whether the plan was a COLLSCAN.
+"""
+import asyncio
+import logging
+import os
+import random
+import threading
+from collections import deque
+from datetime import datetime
+from typing import Any, Deque, Dict, List, Optional
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import monitoring
+
+logger = logging.getLogger(__name__)
+
+SLOW_QUERY_THRESHOLD_MS = float(os.environ.get("SLOW_QUERY_THRESHOLD_MS", "100"))
+SLOW_QUERY_EXPLAIN_SAMPLE_RATE = float(os.environ.get("SLOW_QUERY_EXPLAIN_SAMPLE_RATE", "0.1"))
+SLOW_QUERY_HISTORY_SIZE = int(os.environ.get("SLOW_QUERY_HISTORY_SIZE", "200"))
+
+# Commands explain can run against
+EXPLAINABLE_COMMANDS = frozenset(["find", "aggregate", "count", "distinct", "update", "delete", "findAndModify"])
+
+# Session and cluster fields explain rejects or does not need
+_DROPPED_COMMAND_FIELDS = frozenset(["lsid", "txnNumber", "autocommit", "startTransaction"])
+
+
+class SlowQueryListener(monitoring.CommandListener):
+    """Record slow commands and sample them for explain plans"""
+
+    def __init__(self):
+        self.threshold_ms = SLOW_QUERY_THRESHOLD_MS
+        self.sample_rate = SLOW_QUERY_EXPLAIN_SAMPLE_RATE
+        self.entries: Deque[Dict[str, Any]] = deque(maxlen=SLOW_QUERY_HISTORY_SIZE)
+        self._started: Dict[tuple, tuple] = {}
+        self._lock = threading.Lock()
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._db: Optional[AsyncIOMotorDatabase] = None
+
+    def attach(self, loop: asyncio.AbstractEventLoop, db: AsyncIOMotorDatabase) -> None:
+        """Enable explain capture; called once the event loop and database exist"""
+        self._loop = loop
+        self._db = db
+
+    # Listener callbacks run on pymongo's threads, not on the event loop
+
+    def started(self, event: monitoring.CommandStartedEvent) -> None:
+        if event.command_name not in EXPLAINABLE_COMMANDS:
+            return
+        command = {k: v for k, v in event.command.items() if k not in _DROPPED_COMMAND_FIELDS and not k.startswith("$")}
+        with self._lock:
+            self._started[(event.request_id, event.connection_id)] = (event.database_name, command)
+
+    def succeeded(self, event: monitoring.CommandSucceededEvent) -> None:
+        self._finish(event, failed=False)
+
+    def failed(self, event: monitoring.CommandFailedEvent) -> None:
+        self._finish(event, failed=True)
+
+    def _finish(self, event, failed: bool) -> None:
+        with self._lock:
+            started = self._started.pop((event.request_id, event.connection_id), None)
+
+        duration_ms = event.duration_micros / 1000
+        if started is None or duration_ms < self.threshold_ms:
+            return
+
+        database_name, command = started
+        entry = {
+            "at": datetime.utcnow(),
+            "command": event.command_name,
+            "database": database_name,
+            "collection": command.get(event.command_name),
+            "duration_ms": round(duration_ms, 2),
+            "failed": failed,
+            "explained": False,
+            "collscan": None,
+            "indexes_used": None,
+            "winning_plan": None,
+        }
+        self.entries.append(entry)
+        logger.warning(
+            "Slow MongoDB %s on %s took %.1f ms", event.command_name, entry["collection"], duration_ms,
+            extra={"command": event.command_name, "collection": entry["collection"], "duration_ms": entry["duration_ms"]}
+        )
+
+        if self._loop is None or failed or random.random() >= self.sample_rate:
+            return
+        try:
+            self._loop.call_soon_threadsafe(asyncio.ensure_future, self._explain(entry, command))
+        except RuntimeError:
+            # Event loop already closed during shutdown
+            pass
+
+    async def _explain(self, entry: Dict[str, Any], command: Dict[str, Any]) -> None:
+        try:
+            result = await self._db.client[entry["database"]].command(
+                {"explain": command, "verbosity": "queryPlanner"}
+            )
+        except Exception as e:
+            logger.info("Explain failed for slow %s: %s", entry["command"], e)
+            return
+
+        winning_plans = list(_find_key(result, "winningPlan"))
+        stages = [stage for plan in winning_plans for stage in _plan_stages(plan)]
+        entry["explained"] = True
+        entry["winning_plan"] = winning_plans[0] if winning_plans else None
+        entry["collscan"] = any(stage.get("stage") == "COLLSCAN" for stage in stages)
+        entry["indexes_used"] = sorted({stage["indexName"] for stage in stages if stage.get("indexName")})
+
+    def recent(self, limit: int = 50) -> List[Dict[str, Any]]:
+        """Most recent slow operations, newest first"""
+        return list(self.entries)[::-1][:limit]
+
+
+def _find_key(document: Any, key: str):
+    """Yield every value stored under key anywhere in a nested explain document"""
+    if isinstance(document, dict):
+        for k, v in document.items():
+            if k == key:
+                yield v
+            else:
+                yield from _find_key(v, key)
+    elif isinstance(document, list):
+        for item in document:
+            yield from _find_key(item, key)
+
+
+def _plan_stages(plan: Any):
+    """Yield every stage of a query plan tree"""
+    if not isinstance(plan, dict):
+        return
+    yield plan
+    for child_key in ("inputStage", "queryPlan"):
+        yield from _plan_stages(plan.get(child_key))
+    for child in plan.get("inputStages", []):
+        yield from _plan_stages(child)
+
+
+slow_query_listener = SlowQueryListener()
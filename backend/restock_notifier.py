@@ -0,0 +1,166 @@
+"""
+Restock fan-out for Notify Me subscribers
+
+When a product comes back in stock the admin update only queues the product
+here. A single background worker streams the matching notify_requests with a
+cursor, sends WhatsApp messages in rate-limited batches and deletes the rows
+that were notified, so the admin request never waits on Twilio.
+"""
+import asyncio
+import logging
+import os
+import time
+from typing import List, Optional, Set
+
+from motor.motor_asyncio import AsyncIOMotorDatabase
+
+from whatsapp_service import send_restock_notification
+
+logger = logging.getLogger(__name__)
+
+# Subscribers sent per batch and the sustained send rate across batches
+RESTOCK_BATCH_SIZE = int(os.environ.get("RESTOCK_NOTIFY_BATCH_SIZE", "50"))
+RESTOCK_MESSAGES_PER_SECOND = float(os.environ.get("RESTOCK_NOTIFY_RATE_PER_SEC", "10"))
+
+_queue: Optional[asyncio.Queue] = None
+_worker_task: Optional[asyncio.Task] = None
+_pending_products: Set[str] = set()
+
+
+def schedule_restock_notifications(db: AsyncIOMotorDatabase, product: dict) -> None:
+    """
+    Queue a restock fan-out for a product
+    Returns immediately; a product already waiting in the queue is not queued twice
+    """
+    product_id = product.get("id")
+    if not product_id or product_id in _pending_products:
+        return
+
+    _ensure_worker()
+    _pending_products.add(product_id)
+    _queue.put_nowait((db, product_id))
+    logger.info("Restock notifications queued for product %s", product_id)
+
+
+def start_restock_worker() -> None:
+    """Start the background worker (called on application startup)"""
+    _ensure_worker()
+
+
+async def stop_restock_worker(drain_timeout: float = 0) -> None:
+    """
+    Stop the background worker (called on application shutdown)
+    Queued fan-outs get up to drain_timeout seconds to finish first
+    """
+    global _queue, _worker_task
+    if _worker_task is None:
+        return
+
+    if drain_timeout > 0 and _queue is not None and not _worker_task.done():
+        try:
+            await asyncio.wait_for(_queue.join(), drain_timeout)
+        except asyncio.TimeoutError:
+            logger.warning("Restock fan-out still running at shutdown, %d product(s) left", len(_pending_products))
+
+    _worker_task.cancel()
+    try:
+        await _worker_task
+    except asyncio.CancelledError:
+        pass
+    _worker_task = None
+    # The queue belongs to this event loop; a restarted app starts with a new one
+    _queue = None
+    _pending_products.clear()
+
+
+def _ensure_worker() -> None:
+    global _queue, _worker_task
+    if _queue is None:
+        _queue = asyncio.Queue()
+    if _worker_task is None or _worker_task.done():
+        _worker_task = asyncio.create_task(_run_worker())
+
+
+async def _run_worker() -> None:
+    while True:
+        db, product_id = await _queue.get()
+        try:
+            await notify_restocked_product(db, product_id)
+        except Exception:
+            logger.exception("Restock fan-out failed for product %s", product_id)
+        finally:
+            _pending_products.discard(product_id)
+            _queue.task_done()
+
+
+async def notify_restocked_product(db: AsyncIOMotorDatabase, product_id: str) -> int:
+    """
+    Notify every subscriber of a product that it is back in stock
+    Returns the number of subscribers notified
+    """
+    product = await db.products.find_one(
+        {"id": product_id},
+        {"_id": 0, "name_en": 1, "name_ar": 1, "quantity": 1}
+    )
+    if not product or product.get("quantity", 0) <= 0:
+        return 0
+
+    cursor = db.notify_requests.find(
+        {"product_id": product_id},
+        {"_id": 0, "id": 1, "phone": 1, "name": 1}
+    ).batch_size(RESTOCK_BATCH_SIZE)
+
+    notified = 0
+    batch: List[dict] = []
+    async for notify_request in cursor:
+        batch.append(notify_request)
+        if len(batch) < RESTOCK_BATCH_SIZE:
+            continue
+
+        notified += await _send_batch(db, product, batch)
+        batch = []
+
+        # Stop early if the product sold out again while we were sending
+        current = await db.products.find_one({"id": product_id}, {"_id": 0, "quantity": 1})
+        if not current or current.get("quantity", 0) <= 0:
+            await cursor.close()
+            logger.info("Product %s sold out again, stopping restock fan-out", product_id)
+            return notified
+
+    if batch:
+        notified += await _send_batch(db, product, batch)
+
+    logger.info("Restock fan-out for product %s notified %d subscriber(s)", product_id, notified)
+    return notified
+
+
+async def _send_batch(db: AsyncIOMotorDatabase, product: dict, batch: List[dict]) -> int:
+    """Send one batch concurrently, delete the notified rows and pace to the rate limit"""
+    started = time.monotonic()
+
+    results = await asyncio.gather(*[
+        asyncio.to_thread(
+            send_restock_notification,
+            phone=notify_request["phone"],
+            product_name_en=product.get("name_en", ""),
+            product_name_ar=product.get("name_ar", ""),
+            name=notify_request.get("name")
+        )
+        for notify_request in batch
+    ], return_exceptions=True)
+
+    # Failed sends keep their row so the next restock retries them
+    sent_ids = [
+        notify_request["id"]
+        for notify_request, result in zip(batch, results)
+        if isinstance(result, dict) and result.get("success")
+    ]
+    if sent_ids:
+        await db.notify_requests.delete_many({"id": {"$in": sent_ids}})
+
+    if RESTOCK_MESSAGES_PER_SECOND > 0:
+        remaining = len(batch) / RESTOCK_MESSAGES_PER_SECOND - (time.monotonic() - started)
+        if remaining > 0:
+            await asyncio.sleep(remaining)
+
+    return len(sent_ids)
@@ -0,0 +1,147 @@
+"""
+In-process bilingual product search
+
+An inverted index over name_en, name_ar, description_en and description_ar.
+Text is folded (lowercase, Arabic diacritics stripped, alef / yaa / taa
+marbuta variants unified) before tokenizing, so "عطر الوردة" finds
+"عطرُ الورده". Every query token may match a whole term or, for typeahead,
+the start of a term. Results are ranked by field-weighted TF-IDF.
+
+The index subscribes to the product catalog cache and re-indexes only the
+products whose searchable text changed.
+"""
+import bisect
+import math
+from collections import defaultdict
+from typing import Dict, List, Optional, Tuple
+
+from catalog_cache import product_catalog
+from text_utils import tokenize
+
+# Matches in names count more than matches in descriptions
+FIELD_WEIGHTS = {
+    "name_en": 3.0,
+    "name_ar": 3.0,
+    "description_en": 1.0,
+    "description_ar": 1.0,
+}
+# A prefix match scores less than the whole word
+PREFIX_MATCH_FACTOR = 0.5
+MIN_PREFIX_LENGTH = 2
+
+
+class ProductSearchIndex:
+    def __init__(self):
+        # term -> product id -> weighted term frequency
+        self._postings: Dict[str, Dict[str, float]] = defaultdict(dict)
+        # product id -> (indexed text signature, its terms)
+        self._documents: Dict[str, Tuple[tuple, Dict[str, float]]] = {}
+        # All terms, sorted, for prefix range lookups
+        self._sorted_terms: List[str] = []
+
+    # ---- catalog listener ----
+
+    def on_catalog_reload(self, products: Dict[str, dict]) -> None:
+        for product_id in list(self._documents):
+            if product_id not in products:
+                self._remove(product_id)
+        for product in products.values():
+            self._index(product)
+
+    def on_product_upsert(self, product: dict) -> None:
+        self._index(product)
+
+    def on_product_remove(self, product_id: str) -> None:
+        self._remove(product_id)
+
+    # ---- indexing ----
+
+    def _index(self, product: dict) -> None:
+        product_id = product["id"]
+        signature = tuple(product.get(field) or "" for field in FIELD_WEIGHTS)
+        existing = self._documents.get(product_id)
+        if existing and existing[0] == signature:
+            return
+        if existing:
+            self._remove(product_id)
+
+        terms: Dict[str, float] = defaultdict(float)
+        for field, text in zip(FIELD_WEIGHTS, signature):
+            for token in tokenize(text):
+                terms[token] += FIELD_WEIGHTS[field]
+
+        for term, weight in terms.items():
+            postings = self._postings[term]
+            if not postings:
+                bisect.insort(self._sorted_terms, term)
+            postings[product_id] = weight
+        self._documents[product_id] = (signature, dict(terms))
+
+    def _remove(self, product_id: str) -> None:
+        document = self._documents.pop(product_id, None)
+        if document is None:
+            return
+        for term in document[1]:
+            postings = self._postings.get(term)
+            if postings is None:
+                continue
+            postings.pop(product_id, None)
+            if not postings:
+                del self._postings[term]
+                index = bisect.bisect_left(self._sorted_terms, term)
+                if index < len(self._sorted_terms) and self._sorted_terms[index] == term:
+                    del self._sorted_terms[index]
+
+    # ---- querying ----
+
+    def _idf(self, term: str) -> float:
+        return math.log(1 + len(self._documents) / len(self._postings[term]))
+
+    def _prefix_terms(self, prefix: str) -> List[str]:
+        start = bisect.bisect_left(self._sorted_terms, prefix)
+        end = bisect.bisect_left(self._sorted_terms, prefix + "\uffff", start)
+        return self._sorted_terms[start:end]
+
+    def _token_scores(self, token: str) -> Dict[str, float]:
+        """Score of every product matching one query token, by whole word or prefix"""
+        scores: Dict[str, float] = defaultdict(float)
+        if token in self._postings:
+            idf = self._idf(token)
+            for product_id, weight in self._postings[token].items():
+                scores[product_id] += weight * idf
+
+        if len(token) >= MIN_PREFIX_LENGTH:
+            for term in self._prefix_terms(token):
+                if term == token:
+                    continue
+                idf = self._idf(term) * PREFIX_MATCH_FACTOR
+                for product_id, weight in self._postings[term].items():
+                    # A product matching both ways keeps its best match, not the sum
+                    scores[product_id] = max(scores[product_id], weight * idf)
+        return scores
+
+    def search(self, query: str, limit: Optional[int] = None) -> List[Tuple[str, float]]:
+        """
+        Product ids matching every query token, best first
+        Returns a list of (product_id, score)
+        """
+        tokens = list(dict.fromkeys(tokenize(query)))
+        if not tokens:
+            return []
+
+        totals: Optional[Dict[str, float]] = None
+        for token in tokens:
+            scores = self._token_scores(token)
+            if totals is None:
+                totals = dict(scores)
+            else:
+                totals = {product_id: totals[product_id] + score for product_id, score in scores.items() if product_id in totals}
+            if not totals:
+                return []
+
+        ranked = sorted(totals.items(), key=lambda item: (-item[1], item[0]))
+        return ranked[:limit] if limit else ranked
+
+
+product_search_index = ProductSearchIndex()
+product_catalog.subscribe(product_search_index)
@@ -0,0 +1,80 @@
+"""
+Fast JSON responses
+
+FastJSONResponse (the application's default response class) encodes with
+orjson when it is installed and falls back to the standard json module.
+
+Routes returning documents that came straight from our own collections can
+skip response-model validation altogether: trusted_response() shapes each
+document to the model's fields and defaults with plain dict operations and
+returns a response that FastAPI sends as-is. Keep response_model on those
+routes for the OpenAPI schema; FastAPI does not validate a returned Response.
+"""
+import json
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Tuple, Type
+
+from fastapi.responses import JSONResponse, ORJSONResponse, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is in requirements.txt
+    orjson = None
+
+
+def _json_default(value: Any):
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def dumps(content: Any) -> bytes:
+    if orjson is not None:
+        return orjson.dumps(content, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(content, default=_json_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+FastJSONResponse = ORJSONResponse if orjson is not None else JSONResponse
+
+
+class TrustedJSONResponse(Response):
+    """Encode already-trusted content without jsonable_encoder or model validation"""
+
+    media_type = "application/json"
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+@lru_cache(maxsize=None)
+def _model_shape(model: Type[BaseModel]) -> Tuple[Tuple[str, ...], Dict[str, Any]]:
+    """Field names of a model and the static defaults of its optional fields"""
+    fields = tuple(model.model_fields)
+    defaults = {
+        name: field.default
+        for name, field in model.model_fields.items()
+        if not field.is_required() and field.default_factory is None
+    }
+    return fields, defaults
+
+
+def model_projection(model: Type[BaseModel]) -> Dict[str, int]:
+    """Mongo projection fetching only the model's fields"""
+    fields, _ = _model_shape(model)
+    return {"_id": 0, **{name: 1 for name in fields}}
+
+
+def shape_documents(model: Type[BaseModel], documents: Iterable[dict]) -> List[dict]:
+    """Drop fields the model doesn't declare and fill missing static defaults"""
+    fields, defaults = _model_shape(model)
+    return [
+        {**defaults, **{name: document[name] for name in fields if name in document}}
+        for document in documents
+    ]
+
+
+def trusted_response(model: Type[BaseModel], documents: Iterable[dict]) -> TrustedJSONResponse:
+    """Response for documents read from our own database, shaped like List[model]"""
+    return TrustedJSONResponse(shape_documents(model, documents))
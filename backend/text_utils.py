@@ -0,0 +1,32 @@
+"""
+Text normalization shared by WhatsApp reply parsing and product search
+"""
+import re
+from typing import List
+
+# Arabic diacritics (tashkeel) and tatweel are dropped; alef variants fold to
+# bare alef, alef maqsura to yaa and taa marbuta to haa
+ARABIC_FOLD_TABLE = str.maketrans(
+    {
+        **{chr(code): None for code in range(0x064B, 0x0653)},
+        'ٰ': None,  # superscript alef
+        'ـ': None,  # tatweel
+        'أ': 'ا',
+        'إ': 'ا',
+        'آ': 'ا',
+        'ٱ': 'ا',
+        'ى': 'ي',
+        'ة': 'ه',
+    }
+)
+TOKEN_RE = re.compile(r"\w+")
+
+
+def fold_text(text: str) -> str:
+    """Lowercase and fold Arabic spelling variants"""
+    return text.lower().translate(ARABIC_FOLD_TABLE)
+
+
+def tokenize(text: str) -> List[str]:
+    """Split folded text into word tokens"""
+    return TOKEN_RE.findall(fold_text(text))
@@ -1,80 +1,19 @@
 """
-WhatsApp Service for Order Confirmation via Twilio
+WhatsApp Service for Order Confirmation
+Messages go out through the configured messaging provider (Twilio by default)
 """
-import os
+import logging
 import re
-from twilio.rest import Client
 from typing import Optional
+from messaging import get_messaging_provider
+from phone_utils import normalize_saudi_phone
+from text_utils import TOKEN_RE, fold_text
+
+logger = logging.getLogger(__name__)
 
 # Twilio WhatsApp Sandbox number
 WHATSAPP_SANDBOX_NUMBER = "whatsapp:+14155238886"
 
-# Initialize Twilio client
-def get_twilio_client() -> Optional[Client]:
-    """Get Twilio client if credentials are configured"""
-    account_sid = os.environ.get('TWILIO_ACCOUNT_SID')
-    auth_token = os.environ.get('TWILIO_AUTH_TOKEN')
-    
-    if not account_sid or not auth_token:
-        print("Twilio credentials not configured")
-        return None
-    
-    return Client(account_sid, auth_token)
-
-def normalize_saudi_phone(phone: str) -> str:
-    """
-    Normalize Saudi phone number to international format +966XXXXXXXXX
-    
-    Handles all these formats:
-    - +966506744374 -> +966506744374
-    - 966506744374  -> +966506744374
-    - 0506744374    -> +966506744374
-    - 506744374     -> +966506744374
-    - 00966506744374 -> +966506744374
-    - +966 50 674 4374 -> +966506744374
-    """
-    if not phone:
-        return ""
-    
-    # Remove all non-digit characters except +
-    phone = re.sub(r'[^\d+]', '', phone)
-    
-    # Remove leading + for processing
-    has_plus = phone.startswith('+')
-    if has_plus:
-        phone = phone[1:]
-    
-    # Remove leading zeros (00966 -> 966)
-    phone = phone.lstrip('0')
-    
-    # Now we have digits only, determine the format
-    # Saudi mobile numbers are 9 digits starting with 5
-    # Full format with country code is 12 digits: 966XXXXXXXXX
-    
-    if phone.startswith('966'):
-        # Already has country code: 966506744374
-        phone = '+' + phone
-    elif len(phone) == 9 and phone.startswith('5'):
-        # 9 digits starting with 5: 506744374
-        phone = '+966' + phone
-    elif len(phone) == 10 and phone.startswith('05'):
-        # This shouldn't happen after lstrip('0') but just in case
-        phone = '+966' + phone[1:]
-    else:
-        # Unknown format, try to add +966 if it looks like a Saudi number
-        if len(phone) >= 9:
-            # Take the last 9 digits if they start with 5
-            last_9 = phone[-9:]
-            if last_9.startswith('5'):
-                phone = '+966' + last_9
-            else:
-                phone = '+' + phone  # Keep as is with + prefix
-        else:
-            phone = '+966' + phone  # Assume Saudi
-    
-    print(f"Normalized phone: {phone}")
-    return phone
-
 def format_phone_for_whatsapp(phone: str) -> str:
     """Format phone number for WhatsApp (must include country code)"""
     normalized = normalize_saudi_phone(phone)
@@ -92,9 +31,9 @@ def send_order_confirmation_request(
     Uses Twilio WhatsApp Sandbox for testing
     Returns: dict with success status and message_sid
     """
-    client = get_twilio_client()
-    if not client:
-        return {"success": False, "error": "Twilio not configured"}
+    provider = get_messaging_provider()
+    if not provider:
+        return {"success": False, "error": "Messaging provider not configured"}
     
     # Use sandbox number as sender
     from_number = WHATSAPP_SANDBOX_NUMBER
@@ -124,19 +63,19 @@ Reply *NO* to cancel ❌
 رد بـ *لا* للإلغاء ❌"""
     
     try:
-        message = client.messages.create(
+        message = provider.send(
             body=message_body,
             from_=from_number,
             to=to_number
         )
-        print(f"WhatsApp message sent: SID={message.sid}, Status={message.status}")
+        logger.info("WhatsApp message sent", extra={"message_sid": message.sid, "message_status": message.status})
         return {
             "success": True,
             "message_sid": message.sid,
             "status": message.status
         }
     except Exception as e:
-        print(f"WhatsApp send error: {str(e)}")
+        logger.error("WhatsApp send error: %s", e)
         return {
             "success": False,
             "error": str(e)
@@ -151,9 +90,9 @@ def send_confirmation_status_message(
     Send WhatsApp message confirming the order status change
     Bilingual message (English + Arabic)
     """
-    client = get_twilio_client()
-    if not client:
-        return {"success": False, "error": "Twilio not configured"}
+    provider = get_messaging_provider()
+    if not provider:
+        return {"success": False, "error": "Messaging provider not configured"}
     
     from_number = WHATSAPP_SANDBOX_NUMBER
     to_number = format_phone_for_whatsapp(phone)
@@ -197,18 +136,18 @@ We hope to serve you again soon.
 *Zaylux Store* 🛍️"""
     
     try:
-        message = client.messages.create(
+        message = provider.send(
             body=message_body,
             from_=from_number,
             to=to_number
         )
-        print(f"Confirmation message sent: SID={message.sid}")
+        logger.info("Confirmation message sent", extra={"message_sid": message.sid})
         return {
             "success": True,
             "message_sid": message.sid
         }
     except Exception as e:
-        print(f"Failed to send confirmation message: {str(e)}")
+        logger.error("Failed to send confirmation message: %s", e)
         return {
             "success": False,
             "error": str(e)
@@ -222,9 +161,9 @@ def send_guidance_message(
     Send guidance message when reply is not understood
     Bilingual message (English + Arabic)
     """
-    client = get_twilio_client()
-    if not client:
-        return {"success": False, "error": "Twilio not configured"}
+    provider = get_messaging_provider()
+    if not provider:
+        return {"success": False, "error": "Messaging provider not configured"}
     
     from_number = WHATSAPP_SANDBOX_NUMBER
     to_number = format_phone_for_whatsapp(phone)
@@ -267,40 +206,165 @@ If you have a question, please contact us.
 *Zaylux Store* 🛍️"""
     
     try:
-        message = client.messages.create(
+        message = provider.send(
             body=message_body,
             from_=from_number,
             to=to_number
         )
-        print(f"Guidance message sent: SID={message.sid}")
+        logger.info("Guidance message sent", extra={"message_sid": message.sid})
         return {
             "success": True,
             "message_sid": message.sid
         }
     except Exception as e:
-        print(f"Failed to send guidance message: {str(e)}")
+        logger.error("Failed to send guidance message: %s", e)
         return {
             "success": False,
             "error": str(e)
         }
 
+def send_restock_notification(
+    phone: str,
+    product_name_en: str,
+    product_name_ar: str,
+    name: Optional[str] = None
+) -> dict:
+    """
+    Send WhatsApp message telling a Notify Me subscriber the product is back
+    Bilingual message (English + Arabic)
+    """
+    provider = get_messaging_provider()
+    if not provider:
+        return {"success": False, "error": "Messaging provider not configured"}
+    
+    from_number = WHATSAPP_SANDBOX_NUMBER
+    to_number = format_phone_for_whatsapp(phone)
+    
+    greeting = f"Hello {name}!" if name else "Hello!"
+    greeting_ar = f"مرحباً {name}!" if name else "مرحباً!"
+    
+    message_body = f"""🔔 *BACK IN STOCK!*
+🔔 *عاد إلى المخزون!*
+
+━━━━━━━━━━━━━━━━━━━━
+
+{greeting}
+*{product_name_en}* is available again.
+Order now before it sells out!
+
+{greeting_ar}
+*{product_name_ar}* متوفر الآن من جديد.
+اطلبه الآن قبل نفاد الكمية!
+
+━━━━━━━━━━━━━━━━━━━━
+
+*Zaylux Store* 🛍️"""
+    
+    try:
+        message = provider.send(
+            body=message_body,
+            from_=from_number,
+            to=to_number
+        )
+        logger.info("Restock notification sent", extra={"message_sid": message.sid})
+        return {
+            "success": True,
+            "message_sid": message.sid
+        }
+    except Exception as e:
+        logger.error("Failed to send restock notification: %s", e)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+def send_pending_order_reminder(
+    phone: str,
+    order_id: str,
+    expires_in_minutes: float = 0
+) -> dict:
+    """
+    Send a final reminder for an order still waiting for the customer's reply
+    Bilingual message (English + Arabic)
+    """
+    provider = get_messaging_provider()
+    if not provider:
+        return {"success": False, "error": "Messaging provider not configured"}
+    
+    from_number = WHATSAPP_SANDBOX_NUMBER
+    to_number = format_phone_for_whatsapp(phone)
+    
+    hours = max(round(expires_in_minutes / 60), 1)
+    
+    message_body = f"""⏳ *PLEASE CONFIRM YOUR ORDER*
+⏳ *يرجى تأكيد طلبك*
+
+━━━━━━━━━━━━━━━━━━━━
+
+📦 Order ID: *{order_id}*
+رقم الطلب: *{order_id}*
+
+We haven't received your confirmation yet.
+Reply *YES* to confirm or *NO* to cancel.
+Unconfirmed orders are cancelled automatically in about {hours} hour(s).
+
+لم نستلم تأكيدك بعد.
+أرسل *نعم* للتأكيد أو *لا* للإلغاء.
+يتم إلغاء الطلبات غير المؤكدة تلقائياً خلال {hours} ساعة تقريباً.
+
+━━━━━━━━━━━━━━━━━━━━
+
+*Zaylux Store* 🛍️"""
+    
+    try:
+        message = provider.send(
+            body=message_body,
+            from_=from_number,
+            to=to_number
+        )
+        logger.info("Pending order reminder sent", extra={"message_sid": message.sid})
+        return {
+            "success": True,
+            "message_sid": message.sid
+        }
+    except Exception as e:
+        logger.error("Failed to send pending order reminder: %s", e)
+        return {
+            "success": False,
+            "error": str(e)
+        }
+
+# Letters repeated for emphasis ("yesss", "ايوااا") count once
+_REPEATED_LETTER_RE = re.compile(r"(\w)\1+")
+
+def _squeeze(text: str) -> str:
+    return _REPEATED_LETTER_RE.sub(r"\1", text)
+
+# Whole-token matches only, spelled as they look after folding (and squeezing)
+_YES_TOKENS = frozenset(_squeeze(token) for token in [
+    'yes', 'y', 'yeah', 'yep', 'yup', 'ok', 'okay', 'okey', 'oki', 'confirm', 'confirmed',
+    'نعم', 'اي', 'ايه', 'ايوه', 'ايوا', 'اوكي', 'اوكيه', 'اوك', 'تاكيد', 'اكد', 'اكدت', 'اكيد',
+    'موافق', 'موافقه',
+])
+_NO_TOKENS = frozenset(_squeeze(token) for token in [
+    'no', 'n', 'nope', 'cancel', 'cancelled', 'canceled',
+    'لا', 'لاء', 'الغاء', 'الغي', 'الغيه', 'كنسل', 'كنسله',
+])
+
 def parse_confirmation_reply(message_body: str) -> Optional[str]:
     """
     Parse customer reply to determine confirmation status
     Returns: 'confirmed', 'cancelled', or None if unclear
-    """
-    message_lower = message_body.strip().lower()
     
-    # Check for YES responses (English and Arabic)
-    yes_responses = ['yes', 'y', 'نعم', 'اي', 'ايه', 'اوكي', 'ok', 'okay', 'confirm', 'تأكيد', 'أكد', 'موافق']
-    for yes in yes_responses:
-        if yes in message_lower:
-            return 'confirmed'
-    
-    # Check for NO responses (English and Arabic)
-    no_responses = ['no', 'n', 'لا', 'cancel', 'الغاء', 'إلغاء', 'لأ', 'كنسل']
-    for no in no_responses:
-        if no in message_lower:
-            return 'cancelled'
+    Matching is per word, so "thanks" or "nothing" no longer count as a reply.
+    A message containing both a YES and a NO word is treated as unclear.
+    """
+    tokens = set(TOKEN_RE.findall(_squeeze(fold_text(message_body))))
+    is_yes = not _YES_TOKENS.isdisjoint(tokens)
+    is_no = not _NO_TOKENS.isdisjoint(tokens)
     
+    if is_yes and not is_no:
+        return 'confirmed'
+    if is_no and not is_yes:
+        return 'cancelled'
     return None
@@ -0,0 +1,53 @@
+import { useEffect, useRef } from 'react';
+import adminAPI from '../services/adminAPI';
+
+const EVENT_TYPES = ['order_created', 'order_updated', 'low_stock', 'reset'];
+const RECONNECT_DELAY_MS = 3000;
+
+// Subscribes to the admin live feed. `handlers` maps an event type to a callback taking the parsed payload.
+// The server ends each stream after a while (and when it shuts down), so on every error the source is
+// closed and reopened with a new ticket, resuming after the last event seen.
+const useAdminEvents = (handlers) => {
+  const handlersRef = useRef(handlers);
+  handlersRef.current = handlers;
+
+  useEffect(() => {
+    let source = null;
+    let reconnectTimer = null;
+    let lastEventId = null;
+    let closed = false;
+
+    const connect = async () => {
+      try {
+        source = await adminAPI.openEventStream(lastEventId);
+      } catch (error) {
+        if (!closed) reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+        return;
+      }
+      if (closed) {
+        source.close();
+        return;
+      }
+      EVENT_TYPES.forEach((type) => {
+        source.addEventListener(type, (event) => {
+          if (event.lastEventId) lastEventId = event.lastEventId;
+          const handler = handlersRef.current[type];
+          if (handler) handler(JSON.parse(event.data));
+        });
+      });
+      source.onerror = () => {
+        source.close();
+        if (!closed) reconnectTimer = setTimeout(connect, RECONNECT_DELAY_MS);
+      };
+    };
+
+    connect();
+    return () => {
+      closed = true;
+      clearTimeout(reconnectTimer);
+      if (source) source.close();
+    };
+  }, []);
+};
+
+export default useAdminEvents;
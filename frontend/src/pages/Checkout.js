@@ -1,4 +1,4 @@
-import React, { useState, useEffect } from 'react';
+import React, { useState, useEffect, useRef } from 'react';
 import { useNavigate } from 'react-router-dom';
 import { Package, MapPin, Phone, User, CheckCircle, Copy, Search, Tag, Percent } from 'lucide-react';
 import { Button } from '../components/ui/button';
@@ -36,6 +36,10 @@ const Checkout = () => {
   const [publicOrderId, setPublicOrderId] = useState(null);
   const [orderPlaced, setOrderPlaced] = useState(false);
   const [availableCoupons, setAvailableCoupons] = useState([]);
+  // One key per checkout so double submits and network retries create a single order
+  const idempotencyKeyRef = useRef(
+    window.crypto?.randomUUID ? window.crypto.randomUUID() : `${Date.now()}-${Math.random().toString(36).slice(2)}`
+  );
 
   useEffect(() => {
     fetchAvailableCoupons();
@@ -123,7 +127,7 @@ const Checkout = () => {
     };
 
     try {
-      const response = await publicAPI.createOrder(orderData);
+      const response = await publicAPI.createOrder(orderData, idempotencyKeyRef.current);
       setPublicOrderId(response.public_order_id);
       toast.success(language === 'ar' ? 'تم تقديم الطلب بنجاح!' : 'Order placed successfully!');
       setOrderPlaced(true);
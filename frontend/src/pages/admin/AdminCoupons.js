@@ -86,7 +86,7 @@ const AdminCoupons = () => {
 
     try {
       if (editingCoupon) {
-        await adminAPI.updateCoupon(editingCoupon.id, couponData);
+        await adminAPI.updateCoupon(editingCoupon.id, couponData, editingCoupon.updated_at);
         toast.success('Coupon updated successfully');
       } else {
         await adminAPI.createCoupon(couponData);
@@ -11,11 +11,16 @@ import { Card, CardContent } from '../../components/ui/card';
 import { Eye, Bell } from 'lucide-react';
 import { toast } from 'sonner';
 
+// Notify requests loaded per page in the drill-down (the endpoint caps a page at 500)
+const REQUESTS_PAGE_SIZE = 100;
+
 const AdminDemand = () => {
   const [demandData, setDemandData] = useState([]);
   const [selectedProduct, setSelectedProduct] = useState(null);
   const [requests, setRequests] = useState([]);
   const [dialogOpen, setDialogOpen] = useState(false);
+  const [hasMoreRequests, setHasMoreRequests] = useState(false);
+  const [loadingMore, setLoadingMore] = useState(false);
   const [loading, setLoading] = useState(true);
 
   useEffect(() => {
@@ -35,15 +40,33 @@ const AdminDemand = () => {
 
   const handleViewRequests = async (product) => {
     try {
-      const data = await adminAPI.getProductNotifyRequests(product._id);
+      const data = await adminAPI.getProductNotifyRequests(product._id, 0, REQUESTS_PAGE_SIZE);
       setSelectedProduct(product);
       setRequests(data);
+      setHasMoreRequests(data.length === REQUESTS_PAGE_SIZE);
       setDialogOpen(true);
     } catch (error) {
       toast.error('Failed to fetch requests');
     }
   };
 
+  const handleLoadMoreRequests = async () => {
+    setLoadingMore(true);
+    try {
+      const data = await adminAPI.getProductNotifyRequests(
+        selectedProduct._id,
+        requests.length,
+        REQUESTS_PAGE_SIZE
+      );
+      setRequests((current) => [...current, ...data]);
+      setHasMoreRequests(data.length === REQUESTS_PAGE_SIZE);
+    } catch (error) {
+      toast.error('Failed to fetch more requests');
+    } finally {
+      setLoadingMore(false);
+    }
+  };
+
   if (loading) {
     return <div className="text-white">Loading product demand data...</div>;
   }
@@ -114,7 +137,12 @@ const AdminDemand = () => {
               </div>
 
               <div>
-                <h3 className="text-lg font-semibold text-white mb-4">Customer Requests</h3>
+                <div className="flex items-center justify-between mb-4">
+                  <h3 className="text-lg font-semibold text-white">Customer Requests</h3>
+                  <p className="text-sm text-gray-400">
+                    Showing {requests.length} of {selectedProduct.count}
+                  </p>
+                </div>
                 <div className="space-y-3">
                   {requests.map((request, index) => (
                     <div key={request.id || index} className="bg-zinc-800 p-4 rounded-md">
@@ -137,6 +165,16 @@ const AdminDemand = () => {
                     </div>
                   ))}
                 </div>
+                {hasMoreRequests && (
+                  <Button
+                    onClick={handleLoadMoreRequests}
+                    disabled={loadingMore}
+                    variant="outline"
+                    className="w-full mt-4 border-zinc-700 text-white hover:bg-zinc-800"
+                  >
+                    {loadingMore ? 'Loading...' : 'Load More'}
+                  </Button>
+                )}
               </div>
 
               <div className="bg-blue-500/10 border border-blue-500/30 rounded-md p-4">
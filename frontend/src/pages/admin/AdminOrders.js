@@ -1,5 +1,6 @@
 import React, { useState, useEffect } from 'react';
 import adminAPI from '../../services/adminAPI';
+import useAdminEvents from '../../hooks/useAdminEvents';
 import { Button } from '../../components/ui/button';
 import { Label } from '../../components/ui/label';
 import { Select, SelectContent, SelectItem, SelectTrigger, SelectValue } from '../../components/ui/select';
@@ -38,6 +39,23 @@ const AdminOrders = () => {
     }
   };
 
+  useAdminEvents({
+    // Apply pushed changes in place; only a "reset" (missed events) refetches the whole list
+    order_created: ({ order }) => {
+      toast.success(`New order ${order.public_order_id || order.id.substring(0, 8)}`);
+      if (confirmationFilter !== 'all' && confirmationFilter !== order.confirmation_status) return;
+      setOrders((current) => (current.some(({ id }) => id === order.id) ? current : [order, ...current]));
+    },
+    order_updated: ({ order_id, changes }) => {
+      setOrders((current) => current.map((order) => (order.id === order_id ? { ...order, ...changes } : order)));
+      setSelectedOrder((current) => (current?.id === order_id ? { ...current, ...changes } : current));
+    },
+    low_stock: ({ name_en, quantity }) => {
+      toast.warning(`Low stock: ${name_en} (${quantity} left)`);
+    },
+    reset: () => fetchOrders(),
+  });
+
   const handleViewOrder = async (orderId) => {
     try {
       const order = await adminAPI.getOrder(orderId);
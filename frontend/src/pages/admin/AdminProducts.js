@@ -180,7 +180,7 @@ const AdminProducts = () => {
 
     try {
       if (editingProduct) {
-        await adminAPI.updateProduct(editingProduct.id, productData);
+        await adminAPI.updateProduct(editingProduct.id, productData, editingProduct.updated_at);
         toast.success('Product updated successfully');
       } else {
         await adminAPI.createProduct(productData);
@@ -45,6 +45,23 @@ class AdminAPI {
   }
 
   // Products
+  // Live order/stock feed (Server-Sent Events). EventSource can't send headers, so the stream is opened
+  // with a short-lived single-use ticket instead of the token. A ticket is spent on connect, so every
+  // reconnect needs a new one; pass the last seen event id to resume. On a "reset" event, refetch the lists.
+  async createEventStreamTicket() {
+    const response = await axios.post(`${API}/admin/events/ticket`, null, {
+      headers: this.getHeaders()
+    });
+    return response.data;
+  }
+
+  async openEventStream(lastEventId) {
+    const { ticket } = await this.createEventStreamTicket();
+    const params = new URLSearchParams({ ticket });
+    if (lastEventId) params.set('after', lastEventId);
+    return new EventSource(`${API}/admin/events/stream?${params}`);
+  }
+
   async getProducts() {
     const response = await axios.get(`${API}/admin/products`, {
       headers: this.getHeaders()
@@ -65,6 +82,20 @@ class AdminAPI {
     return response.data;
   }
 
+  async importProducts(file, dryRun = false) {
+    const formData = new FormData();
+    formData.append('file', file);
+    
+    const response = await axios.post(`${API}/admin/products/import`, formData, {
+      headers: {
+        ...this.getHeaders(),
+        'Content-Type': 'multipart/form-data'
+      },
+      params: { dry_run: dryRun }
+    });
+    return response.data;
+  }
+
   async deleteImage(imageUrl) {
     const response = await axios.delete(`${API}/admin/delete-image`, {
       params: { image_url: imageUrl },
@@ -80,9 +111,14 @@ class AdminAPI {
     return response.data;
   }
 
-  async updateProduct(productId, productData) {
+  // expectedUpdatedAt: the updated_at last read; the server answers 409 if it changed since
+  async updateProduct(productId, productData, expectedUpdatedAt = null) {
+    const headers = this.getHeaders();
+    if (expectedUpdatedAt) {
+      headers['If-Match'] = expectedUpdatedAt;
+    }
     const response = await axios.put(`${API}/admin/products/${productId}`, productData, {
-      headers: this.getHeaders()
+      headers
     });
     return response.data;
   }
@@ -131,6 +167,24 @@ class AdminAPI {
     return response.data;
   }
 
+  async bulkUpdateOrderStatus(orderIds, status) {
+    const response = await axios.post(
+      `${API}/admin/orders/bulk-status`,
+      { order_ids: orderIds, status },
+      { headers: this.getHeaders() }
+    );
+    return response.data;
+  }
+
+  async bulkDeleteOrders(orderIds) {
+    const response = await axios.post(
+      `${API}/admin/orders/bulk-delete`,
+      { order_ids: orderIds },
+      { headers: this.getHeaders() }
+    );
+    return response.data;
+  }
+
   // Customers
   async getCustomers() {
     const response = await axios.get(`${API}/admin/customers`, {
@@ -170,9 +224,10 @@ class AdminAPI {
     return response.data;
   }
 
-  async getProductNotifyRequests(productId) {
+  async getProductNotifyRequests(productId, skip = 0, limit = 100) {
     const response = await axios.get(`${API}/admin/notify-requests/${productId}`, {
-      headers: this.getHeaders()
+      headers: this.getHeaders(),
+      params: { skip, limit }
     });
     return response.data;
   }
@@ -192,9 +247,13 @@ class AdminAPI {
     return response.data;
   }
 
-  async updateCoupon(couponId, couponData) {
+  async updateCoupon(couponId, couponData, expectedUpdatedAt = null) {
+    const headers = this.getHeaders();
+    if (expectedUpdatedAt) {
+      headers['If-Match'] = expectedUpdatedAt;
+    }
     const response = await axios.put(`${API}/admin/coupons/${couponId}`, couponData, {
-      headers: this.getHeaders()
+      headers
     });
     return response.data;
   }
@@ -3,10 +3,24 @@ import axios from 'axios';
 const BACKEND_URL = process.env.REACT_APP_BACKEND_URL;
 const API = `${BACKEND_URL}/api`;
 
+// Facet filters as query params; array values repeat the param (?category=a&category=b)
+const facetParams = (filters = {}) => {
+  const params = new URLSearchParams();
+  Object.entries(filters).forEach(([name, values]) => {
+    [].concat(values).forEach((value) => params.append(name, value));
+  });
+  return params;
+};
+
 class PublicAPI {
   // Products
-  async getProducts() {
-    const response = await axios.get(`${API}/products`);
+  async getProducts(filters = {}) {
+    const response = await axios.get(`${API}/products`, { params: facetParams(filters) });
+    return response.data;
+  }
+
+  async getProductFacets(filters = {}) {
+    const response = await axios.get(`${API}/products/facets`, { params: facetParams(filters) });
     return response.data;
   }
 
@@ -26,8 +40,9 @@ class PublicAPI {
   }
 
   // Orders
-  async createOrder(orderData) {
-    const response = await axios.post(`${API}/orders`, orderData);
+  async createOrder(orderData, idempotencyKey = null) {
+    const headers = idempotencyKey ? { 'Idempotency-Key': idempotencyKey } : {};
+    const response = await axios.post(`${API}/orders`, orderData, { headers });
     return response.data;
   }
 
@@ -0,0 +1,33 @@
+import os
+import sys
+
+import pytest
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+# Backend modules import each other by bare name, as they do when run from backend/
+for path in (BACKEND_DIR, os.path.join(BACKEND_DIR, "backend")):
+    if path not in sys.path:
+        sys.path.insert(0, path)
+
+# Tests run against the in-memory backend and never need a real MongoDB or secrets
+os.environ.setdefault("DB_BACKEND", "mongomock")
+os.environ.setdefault("JWT_SECRET_KEY", "test-secret")
+
+
+@pytest.fixture
+def client():
+    """The app, lifespan included, on a fresh in-memory database"""
+    pytest.importorskip("mongomock_motor")
+    from fastapi.testclient import TestClient
+    from server import app
+
+    with TestClient(app) as client:
+        yield client
+
+
+@pytest.fixture
+def admin_headers():
+    from auth import create_access_token
+
+    return {"Authorization": f"Bearer {create_access_token({'admin_id': 'admin', 'username': 'admin'})}"}
@@ -0,0 +1,62 @@
+import asyncio
+
+import admin_events
+from admin_events import AdminEventBroker, order_updated_event
+
+
+def test_stream_ticket_is_single_use(client, admin_headers, monkeypatch):
+    monkeypatch.setattr(admin_events, "ADMIN_FEED_MAX_STREAM_SECONDS", 0.2)
+    ticket = client.post("/admin/admin/events/ticket", headers=admin_headers).json()["ticket"]
+
+    with client.stream("GET", f"/admin/admin/events/stream?ticket={ticket}") as response:
+        assert response.status_code == 200
+        assert response.headers["content-type"].startswith("text/event-stream")
+        body = "".join(response.iter_text())
+    assert body.startswith("retry: ")
+
+    assert client.get(f"/admin/admin/events/stream?ticket={ticket}").status_code == 401
+
+
+def test_stream_rejects_an_access_token_as_ticket(client, admin_headers):
+    token = admin_headers["Authorization"].split(" ", 1)[1]
+
+    assert client.get(f"/admin/admin/events/stream?ticket={token}").status_code == 401
+
+
+def test_ticket_requires_admin(client):
+    assert client.post("/admin/admin/events/ticket").status_code == 401
+
+
+def test_close_streams_ends_open_and_new_streams():
+    async def scenario():
+        broker = AdminEventBroker()
+        stream = broker.stream()
+        assert (await stream.__anext__()).startswith("retry: ")
+
+        broker.publish_local([order_updated_event("o1", {"status": "Shipped"})])
+        frame = await stream.__anext__()
+        assert "event: order_updated" in frame and '"o1"' in frame
+
+        broker.close_streams()
+        frames = [frame async for frame in stream]
+        assert frames == []
+        assert not broker.has_subscribers
+
+        late = [frame async for frame in broker.stream()]
+        assert len(late) == 1 and late[0].startswith("retry: ")
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
+
+
+def test_stream_resumes_after_last_event_id():
+    async def scenario():
+        broker = AdminEventBroker()
+        broker.publish_local([order_updated_event(order_id, {"status": "Shipped"}) for order_id in ("o1", "o2", "o3")])
+
+        stream = broker.stream("local-1")
+        await stream.__anext__()
+        frames = [await stream.__anext__(), await stream.__anext__()]
+        assert ['"o2"' in frames[0], '"o3"' in frames[1]] == [True, True]
+        await stream.aclose()
+
+    asyncio.run(asyncio.wait_for(scenario(), 5))
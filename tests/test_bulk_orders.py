@@ -0,0 +1,136 @@
+import asyncio
+
+import pytest
+
+import admin_routes
+from models import OrderBulkDelete, OrderBulkStatusUpdate
+from tests.test_mongomock_backend import PRODUCT
+from tests.test_order_idempotency import order_body
+
+
+@pytest.fixture
+def product(client, admin_headers) -> dict:
+    response = client.post("/admin/admin/products", json=PRODUCT, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def place_orders(client, product: dict, count: int) -> list:
+    orders = []
+    for _ in range(count):
+        response = client.post("/api/orders", json=order_body(product))
+        assert response.status_code == 200, response.text
+        orders.append(response.json()["id"])
+    return orders
+
+
+def stock(client, product: dict) -> int:
+    return client.get(f"/api/products/{product['id']}").json()["quantity"]
+
+
+def results(response) -> dict:
+    return {result["order_id"]: result["result"] for result in response.json()["results"]}
+
+
+def test_bulk_status_reports_what_the_write_changed(client, admin_headers, product):
+    shipped, cancelled, pending = place_orders(client, product, 3)
+    url = "/admin/admin/orders/bulk-status"
+    client.put(f"/admin/admin/orders/{shipped}/status", json={"status": "Shipped"}, headers=admin_headers)
+    client.post(url, json={"order_ids": [cancelled], "status": "Cancelled"}, headers=admin_headers)
+
+    response = client.post(
+        url, json={"order_ids": [shipped, cancelled, pending, "missing"], "status": "Shipped"}, headers=admin_headers
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["updated"] == 1
+    assert results(response) == {shipped: "unchanged", cancelled: "skipped", pending: "updated", "missing": "not_found"}
+
+
+def test_bulk_cancel_restores_stock_once(client, admin_headers, product):
+    order_ids = place_orders(client, product, 2)
+    assert stock(client, product) == 1
+    body = {"order_ids": order_ids, "status": "Cancelled"}
+
+    first = client.post("/admin/admin/orders/bulk-status", json=body, headers=admin_headers)
+    second = client.post("/admin/admin/orders/bulk-status", json=body, headers=admin_headers)
+
+    assert first.json()["updated"] == 2
+    assert second.json()["updated"] == 0
+    assert stock(client, product) == 3
+
+
+def test_bulk_delete_restores_stock_of_uncancelled_orders_once(client, admin_headers, product):
+    cancelled, pending = place_orders(client, product, 2)
+    client.post("/admin/admin/orders/bulk-status", json={"order_ids": [cancelled], "status": "Cancelled"}, headers=admin_headers)
+    assert stock(client, product) == 2
+    body = {"order_ids": [cancelled, pending, "missing"]}
+
+    first = client.post("/admin/admin/orders/bulk-delete", json=body, headers=admin_headers)
+    second = client.post("/admin/admin/orders/bulk-delete", json=body, headers=admin_headers)
+
+    assert first.json()["deleted"] == 2
+    assert results(first) == {cancelled: "deleted", pending: "deleted", "missing": "not_found"}
+    assert second.json()["deleted"] == 0
+    assert stock(client, product) == 3
+
+
+class CancelBeforeWrite:
+    """A database whose orders.update_many is preceded by a concurrent cancel of one order"""
+
+    def __init__(self, db, order_id: str):
+        self._db = db
+        self._order_id = order_id
+
+    def __getattr__(self, name):
+        return getattr(self._db, name)
+
+    @property
+    def orders(self):
+        return self
+
+    def find(self, *args, **kwargs):
+        return self._db.orders.find(*args, **kwargs)
+
+    async def update_many(self, *args, **kwargs):
+        await self._db.orders.update_one({"id": self._order_id}, {"$set": {"status": "Cancelled"}})
+        return await self._db.orders.update_many(*args, **kwargs)
+
+
+def test_bulk_status_skips_an_order_cancelled_after_the_read(client, product):
+    cancelled_meanwhile, pending = place_orders(client, product, 2)
+    db = CancelBeforeWrite(client.app.state.db, cancelled_meanwhile)
+    request = OrderBulkStatusUpdate(order_ids=[cancelled_meanwhile, pending], status="Shipped")
+
+    response = client.portal.call(lambda: admin_routes.bulk_update_order_status(request, admin={}, db=db))
+
+    assert response["updated"] == 1
+    assert response["results"] == [
+        {"order_id": cancelled_meanwhile, "result": "skipped"},
+        {"order_id": pending, "result": "updated"},
+    ]
+
+
+def test_overlapping_bulk_deletes_restore_stock_once(client, product, monkeypatch):
+    order_ids = place_orders(client, product, 2)
+    db = client.app.state.db
+    real_restore_stock = admin_routes.restore_stock
+
+    async def restore_stock_after_yielding(*args):
+        # Let the other request run up to the same point before either restores
+        await asyncio.sleep(0)
+        return await real_restore_stock(*args)
+
+    monkeypatch.setattr(admin_routes, "restore_stock", restore_stock_after_yielding)
+
+    async def delete_twice():
+        request = OrderBulkDelete(order_ids=order_ids)
+        return await asyncio.gather(
+            admin_routes.bulk_delete_orders(request, admin={}, db=db),
+            admin_routes.bulk_delete_orders(request, admin={}, db=db),
+        )
+
+    first, second = client.portal.call(delete_twice)
+
+    assert first["deleted"] + second["deleted"] == 2
+    assert stock(client, product) == 3
@@ -0,0 +1,78 @@
+import pytest
+
+from whatsapp_service import parse_confirmation_reply
+
+# Labeled replies as customers send them: (message, expected parse)
+CORPUS = [
+    # English confirmations
+    ("yes", "confirmed"),
+    ("Yes", "confirmed"),
+    ("YES!", "confirmed"),
+    ("y", "confirmed"),
+    ("yeah sure", "confirmed"),
+    ("yep", "confirmed"),
+    ("yesss", "confirmed"),
+    ("ok", "confirmed"),
+    ("Okay, thanks", "confirmed"),
+    ("okk", "confirmed"),
+    ("confirm", "confirmed"),
+    ("Confirmed.", "confirmed"),
+    ("yes please confirm my order", "confirmed"),
+    # Arabic confirmations, with and without diacritics / hamza
+    ("نعم", "confirmed"),
+    ("نَعَم", "confirmed"),
+    ("اي", "confirmed"),
+    ("ايه", "confirmed"),
+    ("إيه", "confirmed"),
+    ("ايوه", "confirmed"),
+    ("ايوة", "confirmed"),
+    ("ايوا", "confirmed"),
+    ("إيوا", "confirmed"),
+    ("ايواااا", "confirmed"),
+    ("اوكي", "confirmed"),
+    ("أوكيه", "confirmed"),
+    ("تأكيد", "confirmed"),
+    ("أكد", "confirmed"),
+    ("أكدت الطلب", "confirmed"),
+    ("أكيد", "confirmed"),
+    ("موافق", "confirmed"),
+    ("موافقة", "confirmed"),
+    ("نعم أكد الطلب", "confirmed"),
+    # English cancellations
+    ("no", "cancelled"),
+    ("No.", "cancelled"),
+    ("n", "cancelled"),
+    ("nope", "cancelled"),
+    ("noooo", "cancelled"),
+    ("cancel", "cancelled"),
+    ("Cancel please", "cancelled"),
+    ("cancelled", "cancelled"),
+    ("canceled", "cancelled"),
+    # Arabic cancellations
+    ("لا", "cancelled"),
+    ("لأ", "cancelled"),
+    ("لاء", "cancelled"),
+    ("إلغاء", "cancelled"),
+    ("الغاء الطلب", "cancelled"),
+    ("الغيه", "cancelled"),
+    ("كنسل", "cancelled"),
+    ("كنسله", "cancelled"),
+    # Unclear: no answer word, or both answers at once
+    ("thanks", None),
+    ("Thank you!", None),
+    ("nothing", None),
+    ("when will it arrive?", None),
+    ("any update on my order", None),
+    ("شكرا", None),
+    ("متى يوصل الطلب؟", None),
+    ("", None),
+    ("   ", None),
+    ("yes no", None),
+    ("نعم لا", None),
+    ("no wait yes", None),
+]
+
+
+@pytest.mark.parametrize("message, expected", CORPUS)
+def test_parse_confirmation_reply(message, expected):
+    assert parse_confirmation_reply(message) == expected
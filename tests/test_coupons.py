@@ -0,0 +1,11 @@
+def test_coupon_use_is_counted_immediately(client, admin_headers):
+    created = client.post(
+        "/admin/admin/coupons", json={"code": "eid10", "discount_percentage": 10}, headers=admin_headers
+    )
+    assert created.status_code == 200, created.text
+
+    validated = client.post("/api/coupons/validate", json={"code": "EID10", "order_total": 200})
+
+    assert validated.json()["valid"] is True
+    coupons = client.get("/admin/admin/coupons", headers=admin_headers).json()
+    assert [coupon["usage_count"] for coupon in coupons if coupon["code"] == "EID10"] == [1]
@@ -0,0 +1,103 @@
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import pytest
+
+pytest.importorskip("uvicorn")
+pytest.importorskip("mongomock_motor")
+
+SERVER_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend", "backend")
+PRE_STOP_SECONDS = 3
+
+
+def free_port() -> int:
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def wait_until_ready(url: str, process: subprocess.Popen, timeout: float = 20) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        assert process.poll() is None, "server exited during startup"
+        try:
+            if httpx.get(url, timeout=1).status_code == 200:
+                return
+        except httpx.TransportError:
+            pass
+        time.sleep(0.1)
+    raise AssertionError("server did not become ready")
+
+
+def start_server(port: int) -> subprocess.Popen:
+    env = {
+        **os.environ,
+        "DB_BACKEND": "mongomock",
+        "SHUTDOWN_PRE_STOP_SECONDS": str(PRE_STOP_SECONDS),
+        "PYTHONPATH": os.pathsep.join([os.path.dirname(SERVER_DIR), SERVER_DIR]),
+    }
+    return subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "server:app", "--port", str(port)],
+        cwd=SERVER_DIR, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+    )
+
+
+def test_readyz_reports_draining_between_sigterm_and_stop():
+    port = free_port()
+    process = start_server(port)
+    readyz = f"http://127.0.0.1:{port}/readyz"
+    try:
+        wait_until_ready(readyz, process)
+
+        sent_at = time.monotonic()
+        process.send_signal(signal.SIGTERM)
+        time.sleep(0.5)
+        response = httpx.get(readyz, timeout=1)
+        assert response.status_code == 503
+        assert response.json() == {"status": "draining"}
+        assert process.poll() is None
+
+        process.wait(timeout=PRE_STOP_SECONDS + 15)
+        assert time.monotonic() - sent_at >= PRE_STOP_SECONDS
+        assert process.returncode == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
+
+
+def test_open_admin_feed_does_not_block_shutdown(admin_headers):
+    port = free_port()
+    process = start_server(port)
+    base = f"http://127.0.0.1:{port}"
+    try:
+        wait_until_ready(f"{base}/readyz", process)
+        ticket = httpx.post(f"{base}/admin/admin/events/ticket", headers=admin_headers).json()["ticket"]
+        stream_ended = threading.Event()
+
+        def read_feed():
+            try:
+                with httpx.stream("GET", f"{base}/admin/admin/events/stream", params={"ticket": ticket}, timeout=None) as response:
+                    for _ in response.iter_bytes():
+                        pass
+            except httpx.TransportError:
+                pass
+            stream_ended.set()
+
+        threading.Thread(target=read_feed, daemon=True).start()
+        time.sleep(0.5)
+
+        process.send_signal(signal.SIGTERM)
+        assert stream_ended.wait(2), "feed still open after SIGTERM"
+        process.wait(timeout=PRE_STOP_SECONDS + 10)
+        assert process.returncode == 0
+    finally:
+        if process.poll() is None:
+            process.kill()
+            process.wait()
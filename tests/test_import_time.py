@@ -0,0 +1,26 @@
+import os
+import subprocess
+import sys
+
+BACKEND_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "backend")
+
+# Heavy SDKs that must only load when first used (see messaging.py and auth.py)
+LAZY_MODULES = ["twilio", "jwt", "bcrypt"]
+
+
+def test_server_import_does_not_load_lazy_sdks():
+    script = (
+        "import sys, server; "
+        f"print(','.join(name for name in {LAZY_MODULES!r} if name in sys.modules))"
+    )
+    env = {
+        **os.environ,
+        "DB_BACKEND": "mongomock",
+        "PYTHONPATH": os.pathsep.join([BACKEND_DIR, os.path.join(BACKEND_DIR, "backend")]),
+    }
+    result = subprocess.run(
+        [sys.executable, "-c", script],
+        cwd=os.path.join(BACKEND_DIR, "backend"), env=env, capture_output=True, text=True, timeout=60
+    )
+    assert result.returncode == 0, result.stderr
+    assert result.stdout.strip() == "", f"loaded at import time: {result.stdout.strip()}"
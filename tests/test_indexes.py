@@ -0,0 +1,35 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from pymongo.errors import DuplicateKeyError
+
+from indexes import ensure_indexes
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def make_db():
+    return mongomock_motor.AsyncMongoMockClient()["zaylux_test"]
+
+
+def test_existing_duplicates_are_merged_before_unique_index():
+    async def scenario():
+        db = make_db()
+        now = datetime.utcnow()
+        await db.notify_requests.insert_many([
+            {"id": "a", "product_id": "p1", "phone": "0506744374", "created_at": now - timedelta(days=2)},
+            {"id": "b", "product_id": "p1", "phone": "+966 50 674 4374", "created_at": now - timedelta(days=1)},
+            {"id": "c", "product_id": "p1", "phone": "+966506744374", "created_at": now},
+            {"id": "d", "product_id": "p2", "phone": "0506744374", "created_at": now},
+        ])
+
+        await ensure_indexes(db)
+
+        remaining = await db.notify_requests.find({}, {"_id": 0, "id": 1, "phone": 1}).sort("id", 1).to_list(None)
+        assert remaining == [{"id": "a", "phone": "+966506744374"}, {"id": "d", "phone": "+966506744374"}]
+        assert "product_phone_unique" in await db.notify_requests.index_information()
+        with pytest.raises(DuplicateKeyError):
+            await db.notify_requests.insert_one({"id": "e", "product_id": "p1", "phone": "+966506744374"})
+
+    asyncio.run(scenario())
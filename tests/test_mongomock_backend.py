@@ -0,0 +1,21 @@
+PRODUCT = {
+    "name_en": "Rose Oud",
+    "name_ar": "عود الورد",
+    "description_en": "Warm rose and oud",
+    "description_ar": "ورد وعود",
+    "category": "perfume",
+    "price": 250.0,
+    "quantity": 3,
+    "images": [],
+}
+
+
+def test_create_and_read_product(client, admin_headers):
+    created = client.post("/admin/admin/products", json=PRODUCT, headers=admin_headers)
+    assert created.status_code == 200, created.text
+    product_id = created.json()["id"]
+
+    fetched = client.get(f"/api/products/{product_id}")
+    assert fetched.status_code == 200, fetched.text
+    assert fetched.json()["name_en"] == "Rose Oud"
+    assert fetched.json()["quantity"] == 3
@@ -0,0 +1,89 @@
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+import order_expiry
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+
+def make_order(order_id: str, status: str, product_id: str, quantity: int) -> dict:
+    return {
+        "id": order_id,
+        "public_order_id": f"ZAY-{order_id}",
+        "phone": "+966506744374",
+        "items": [{"product_id": product_id, "quantity": quantity}],
+        "status": status,
+        "confirmation_status": "pending",
+        "created_at": datetime.utcnow() - timedelta(days=3),
+    }
+
+
+async def seed(db) -> None:
+    await db.products.insert_many([{"id": "p1", "quantity": 0}, {"id": "p2", "quantity": 0}])
+    await db.orders.insert_many([
+        make_order("unanswered", "Pending", "p1", 2),
+        make_order("shipped", "Shipped", "p2", 3),
+    ])
+
+
+def test_admin_shipped_order_survives_expiry_sweep():
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["zaylux_test"]
+        await seed(db)
+
+        assert await order_expiry.expire_pending_orders(db) == 1
+
+        unanswered = await db.orders.find_one({"id": "unanswered"})
+        shipped = await db.orders.find_one({"id": "shipped"})
+        assert (unanswered["status"], unanswered["confirmation_status"]) == ("Cancelled", "cancelled")
+        assert (shipped["status"], shipped["confirmation_status"]) == ("Shipped", "pending")
+        assert (await db.products.find_one({"id": "p1"}))["quantity"] == 2
+        assert (await db.products.find_one({"id": "p2"}))["quantity"] == 0
+
+    asyncio.run(scenario())
+
+
+def test_admin_shipped_order_gets_no_reminder(monkeypatch):
+    reminded = []
+    monkeypatch.setattr(order_expiry, "PENDING_ORDER_REMINDER_MINUTES", 60)
+    monkeypatch.setattr(
+        order_expiry, "send_pending_order_reminder",
+        lambda phone, order_id, expires_in_minutes: reminded.append(order_id) or {"success": True}
+    )
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["zaylux_test"]
+        await seed(db)
+
+        assert await order_expiry.send_pending_reminders(db) == 1
+        assert reminded == ["ZAY-unanswered"]
+
+    asyncio.run(scenario())
+
+
+def test_overdue_order_is_not_expired_in_the_sweep_that_reminds_it(monkeypatch):
+    monkeypatch.setattr(order_expiry, "PENDING_ORDER_EXPIRY_MINUTES", 24 * 60)
+    monkeypatch.setattr(order_expiry, "PENDING_ORDER_REMINDER_MINUTES", 60)
+    monkeypatch.setattr(
+        order_expiry, "send_pending_order_reminder",
+        lambda phone, order_id, expires_in_minutes: {"success": True}
+    )
+
+    async def scenario():
+        db = mongomock_motor.AsyncMongoMockClient()["zaylux_test"]
+        await seed(db)
+
+        assert await order_expiry.send_pending_reminders(db) == 1
+        assert await order_expiry.expire_pending_orders(db) == 0
+        assert (await db.orders.find_one({"id": "unanswered"}))["status"] == "Pending"
+
+        # Once the announced time has passed since the reminder, the order expires
+        await db.orders.update_one(
+            {"id": "unanswered"},
+            {"$set": {"reminder_sent_at": datetime.utcnow() - timedelta(hours=23, minutes=1)}}
+        )
+        assert await order_expiry.expire_pending_orders(db) == 1
+
+    asyncio.run(scenario())
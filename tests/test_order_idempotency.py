@@ -0,0 +1,103 @@
+from datetime import datetime
+
+import pytest
+
+import public_routes
+from tests.test_mongomock_backend import PRODUCT
+
+
+def order_body(product: dict, quantity: int = 1) -> dict:
+    return {
+        "customer_name": "Sara",
+        "phone": "0506744374",
+        "city": "Riyadh",
+        "address": "King Fahd Rd",
+        "items": [{
+            "product_id": product["id"],
+            "name_en": product["name_en"],
+            "name_ar": product["name_ar"],
+            "price": product["price"],
+            "quantity": quantity,
+            "image": "",
+        }],
+        "subtotal": product["price"] * quantity,
+        "total": product["price"] * quantity,
+    }
+
+
+@pytest.fixture
+def product(client, admin_headers) -> dict:
+    response = client.post("/admin/admin/products", json=PRODUCT, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def count_orders(client) -> int:
+    return client.portal.call(client.app.state.db.orders.count_documents, {})
+
+
+def test_retry_replays_the_first_order(client, product):
+    headers = {"Idempotency-Key": "checkout-1"}
+    first = client.post("/api/orders", json=order_body(product), headers=headers)
+    retry = client.post("/api/orders", json=order_body(product), headers=headers)
+
+    assert first.status_code == retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert retry.json()["id"] == first.json()["id"]
+    assert count_orders(client) == 1
+
+
+def test_key_being_processed_is_rejected_with_409(client, product):
+    db = client.app.state.db
+    fingerprint = public_routes.request_fingerprint(public_routes.OrderCreate(**order_body(product)).model_dump_json())
+    client.portal.call(db.idempotency_keys.insert_one, {
+        "_id": "orders:checkout-1", "fingerprint": fingerprint, "status": "processing", "created_at": datetime.utcnow()
+    })
+
+    response = client.post("/api/orders", json=order_body(product), headers={"Idempotency-Key": "checkout-1"})
+
+    assert response.status_code == 409
+    assert count_orders(client) == 0
+
+
+def test_key_reused_with_a_different_body_is_rejected_with_422(client, product):
+    headers = {"Idempotency-Key": "checkout-1"}
+    assert client.post("/api/orders", json=order_body(product), headers=headers).status_code == 200
+
+    response = client.post("/api/orders", json=order_body(product, quantity=2), headers=headers)
+
+    assert response.status_code == 422
+    assert count_orders(client) == 1
+
+
+def test_rejected_order_frees_the_key(client, product):
+    headers = {"Idempotency-Key": "checkout-1"}
+    rejected = client.post("/api/orders", json=order_body(product, quantity=10), headers=headers)
+    assert rejected.status_code == 400
+
+    retry = client.post("/api/orders", json=order_body(product, quantity=10), headers=headers)
+
+    assert retry.status_code == 400
+    assert "Idempotent-Replayed" not in retry.headers
+
+
+def test_failure_after_the_insert_does_not_allow_a_second_order(client, product, monkeypatch):
+    real_publish_low_stock = public_routes.publish_low_stock
+    calls = []
+
+    async def fail_once(db, product_ids):
+        calls.append(product_ids)
+        if len(calls) == 1:
+            raise RuntimeError("event feed unavailable")
+        await real_publish_low_stock(db, product_ids)
+
+    monkeypatch.setattr(public_routes, "publish_low_stock", fail_once)
+    headers = {"Idempotency-Key": "checkout-1"}
+    with pytest.raises(RuntimeError):
+        client.post("/api/orders", json=order_body(product), headers=headers)
+
+    retry = client.post("/api/orders", json=order_body(product), headers=headers)
+
+    assert retry.status_code == 200
+    assert retry.headers["Idempotent-Replayed"] == "true"
+    assert count_orders(client) == 1
@@ -0,0 +1,36 @@
+import pytest
+
+from phone_utils import normalize_saudi_phone, phone_match_key, phone_variants
+
+
+@pytest.mark.parametrize("phone, expected", [
+    ("+966506744374", "+966506744374"),
+    ("966506744374", "+966506744374"),
+    ("0506744374", "+966506744374"),
+    ("506744374", "+966506744374"),
+    ("00966506744374", "+966506744374"),
+    ("+966 50 674 4374", "+966506744374"),
+    ("050-674-4374", "+966506744374"),
+    ("whatsapp:+966506744374", "+966506744374"),
+    ("  0506744374  ", "+966506744374"),
+    # Numbers that can't be a Saudi mobile keep their digits
+    ("+12025550123", "+12025550123"),
+    ("", ""),
+])
+def test_normalize_saudi_phone(phone, expected):
+    assert normalize_saudi_phone(phone) == expected
+
+
+def test_match_key_is_the_same_across_formats():
+    formats = ["+966506744374", "0506744374", "506744374", "00966 50 674 4374", "whatsapp:+966506744374"]
+    assert {phone_match_key(phone) for phone in formats} == {"506744374"}
+
+
+def test_match_key_differs_between_customers():
+    assert phone_match_key("0506744374") != phone_match_key("0506744375")
+
+
+def test_phone_variants():
+    assert phone_variants("0506744374") == ["0506744374", "+966506744374"]
+    assert phone_variants("+966506744374") == ["+966506744374"]
+    assert phone_variants("") == [""]
@@ -0,0 +1,93 @@
+import asyncio
+import io
+import json
+import threading
+
+import pytest
+
+from product_import import import_products, read_csv_rows, read_ndjson_rows
+
+mongomock_motor = pytest.importorskip("mongomock_motor")
+
+HEADER = "id,name_en,name_ar,description_en,description_ar,category,price,quantity\n"
+
+
+def csv_row(product_id: str, quantity: int, name: str = "Rose Oud") -> str:
+    return f"{product_id},{name},عود,Warm,دافئ,perfume,250,{quantity}\n"
+
+
+def run_import(db, rows):
+    return asyncio.run(import_products(db, rows))
+
+
+def make_db():
+    return mongomock_motor.AsyncMongoMockClient()["zaylux_test"]
+
+
+async def movements(db):
+    return await db.inventory_movements.find({}, {"_id": 0, "product_id": 1, "delta": 1}).sort("product_id", 1).to_list(None)
+
+
+def test_repeated_new_id_is_written_and_recorded_once():
+    db = make_db()
+    upload = (HEADER + csv_row("p1", 4) + csv_row("p1", 4) + csv_row("p2", 1)).encode()
+
+    report = run_import(db, read_csv_rows(io.BytesIO(upload)))
+
+    assert (report["inserted"], report["failed"]) == (2, 1)
+    assert report["errors"] == [{"row": 3, "id": "p1", "errors": ["Duplicate id, first given in row 2"]}]
+    assert asyncio.run(movements(db)) == [{"product_id": "p1", "delta": 4}, {"product_id": "p2", "delta": 1}]
+
+
+def test_ledger_delta_is_taken_from_the_replaced_quantity():
+    db = make_db()
+    asyncio.run(db.products.insert_one({"id": "p1", "name_en": "Rose Oud", "quantity": 5}))
+
+    report = run_import(db, read_ndjson_rows(io.BytesIO(json.dumps({"id": "p1", "quantity": 8}).encode())))
+
+    assert report["updated"] == 1
+    product = asyncio.run(db.products.find_one({"id": "p1"}))
+    assert product["quantity"] == 8
+    assert "import_batch" not in product
+    assert asyncio.run(movements(db)) == [{"product_id": "p1", "delta": 3}]
+
+
+def test_undecodable_line_fails_alone_with_its_line_number():
+    db = make_db()
+    upload = HEADER.encode() + csv_row("p1", 1).encode() + b"p2,Bad \xff name,x,y,z,perfume,1,1\n" + csv_row("p3", 2).encode()
+
+    report = run_import(db, read_csv_rows(io.BytesIO(upload)))
+
+    assert report["inserted"] == 2
+    assert report["errors"] == [{"row": 3, "id": None, "errors": ["Invalid UTF-8"]}]
+
+
+def test_csv_rows_report_the_line_they_start_on():
+    upload = (HEADER + '"p1",Rose,عود,"two\nlines",دافئ,perfume,250,1\n\n' + csv_row("p2", 1)).encode()
+
+    rows = list(read_csv_rows(io.BytesIO(upload)))
+
+    assert [(line, record["id"]) for line, record, _ in rows] == [(2, "p1"), (5, "p2")]
+
+
+def test_ndjson_errors_keep_physical_line_numbers():
+    upload = b'{"name_en": "a"}\n\nnot json\n\xff\n[1]\n'
+
+    rows = list(read_ndjson_rows(io.BytesIO(upload)))
+
+    assert [(line, error is None) for line, _, error in rows] == [(1, True), (3, False), (4, False), (5, False)]
+
+
+def test_upload_is_read_off_the_event_loop_thread():
+    db = make_db()
+    reading_threads = set()
+
+    class RecordingUpload(io.BytesIO):
+        def __next__(self):
+            reading_threads.add(threading.get_ident())
+            return super().__next__()
+
+    report = run_import(db, read_csv_rows(RecordingUpload((HEADER + csv_row("p1", 4)).encode())))
+
+    assert report["inserted"] == 1
+    assert reading_threads and threading.get_ident() not in reading_threads
@@ -0,0 +1,44 @@
+from tests.test_mongomock_backend import PRODUCT
+
+
+def create_product(client, admin_headers, **fields) -> dict:
+    response = client.post("/admin/admin/products", json={**PRODUCT, **fields}, headers=admin_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
+
+
+def test_if_match_from_the_create_response_is_accepted(client, admin_headers):
+    product = create_product(client, admin_headers)
+
+    response = client.put(
+        f"/admin/admin/products/{product['id']}",
+        json={"price": 260.0},
+        headers={**admin_headers, "If-Match": product["updated_at"]}
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["price"] == 260.0
+
+
+def test_stale_if_match_is_rejected(client, admin_headers):
+    product = create_product(client, admin_headers)
+    url = f"/admin/admin/products/{product['id']}"
+    assert client.put(url, json={"price": 260.0}, headers=admin_headers).status_code == 200
+
+    response = client.put(url, json={"price": 270.0}, headers={**admin_headers, "If-Match": product["updated_at"]})
+
+    assert response.status_code == 409
+
+
+def test_null_clears_optional_fields_and_leaves_required_ones(client, admin_headers):
+    product = create_product(client, admin_headers, original_price=300.0)
+
+    response = client.put(
+        f"/admin/admin/products/{product['id']}",
+        json={"original_price": None, "quantity": None},
+        headers=admin_headers
+    )
+
+    assert response.status_code == 200, response.text
+    assert response.json()["original_price"] is None
+    assert response.json()["quantity"] == 3